@@ -0,0 +1,206 @@
+# Offline command benchmark
+# Drives the real handlers through fake interactions/contexts with local upstream stubs.
+#
+#   python -m bench.commands --iterations 200 --concurrency 8
+#   python -m bench.commands --compare bench/results/<previous>.json
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from bench.fakes import (
+    FakeBot,
+    FakeContext,
+    FakeGuild,
+    FakeInteraction,
+    FakeUser,
+    UpstreamStubs,
+    import_bot,
+    install_fake_yt_dlp,
+    invoke,
+    lift_upstream_limits,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def run_scenario(name: str, op: Callable[[int], Awaitable[Any]], iterations: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            try:
+                await op(i)
+            except Exception:
+                if not errors:
+                    print(f"{name}: first error (later ones are only counted)", file=sys.stderr)
+                    traceback.print_exc()
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    wall = time.perf_counter() - wall
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "ops_per_sec": round(iterations / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def build_world(kb, members: int, listeners: int, seeded_users: int):
+    guild = FakeGuild("bench")
+    users = [guild.add_member(FakeUser()) for _ in range(members)]
+    channel = guild.add_voice_channel("music")
+    for user in users[:listeners]:
+        guild.join_voice(user, channel)
+    fake_bot = FakeBot([guild])
+    kb.bot = fake_bot
+    stats = {str(u.id): random.randint(0, 5 * 3600) for u in users}
+    for _ in range(max(0, seeded_users - members)):
+        stats[str(random.randint(10 ** 17, 10 ** 18))] = random.randint(0, 5 * 3600)
+    kb.write_json(kb.LISTENING_FILE, stats)
+    return guild, users, channel
+
+
+def scenarios(kb, guild: FakeGuild, users: List[FakeUser], channel) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+    def member() -> FakeUser:
+        return random.choice(users)
+
+    async def tracker(i: int) -> None:
+        if guild.voice_client is None:
+            vc = await channel.connect()
+            vc.play(None)
+            kb.refresh_listening_sessions(guild)
+        await kb.start_listening_tracker.coro()
+
+    return {
+        "slash_profile": lambda i: invoke(kb.slash_profile, FakeInteraction(member(), guild)),
+        "slash_leaderboard": lambda i: invoke(kb.slash_leaderboard, FakeInteraction(member(), guild), "all"),
+        "cmd_addsong": lambda i: invoke(kb.cmd_addsong, FakeContext(member(), guild, "addsong"), f"https://soundcloud.com/bench/track-{i}"),
+        "slash_play_autocomplete": lambda i: invoke(kb.autocomplete_play, FakeInteraction(member(), guild), f"bench song {i % 50}"),
+        "slash_anime_search": lambda i: invoke(kb.slash_anime_search, FakeInteraction(member(), guild), f"bench anime {i}"),
+        "slash_anime_search_cached": lambda i: invoke(kb.slash_anime_search, FakeInteraction(member(), guild), "bench anime cached"),
+        "slash_game_search": lambda i: invoke(kb.slash_game_search, FakeInteraction(member(), guild), f"bench game {i}"),
+        "slash_joke": lambda i: invoke(kb.slash_joke, FakeInteraction(member(), guild)),
+        "slash_meme": lambda i: invoke(kb.slash_meme, FakeInteraction(member(), guild)),
+        "start_listening_tracker": tracker,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'command':<28}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    if baseline:
+        header += f"{'Δ ops/s':>10}{'Δ p99':>10}"
+    print(header)
+    for name, r in results.items():
+        line = f"{name:<28}{r['ops_per_sec']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>8}"
+        base = baseline.get(name)
+        if base:
+            d_ops = (r["ops_per_sec"] / base["ops_per_sec"] - 1) * 100 if base["ops_per_sec"] else 0.0
+            d_p99 = (r["p99_ms"] / base["p99_ms"] - 1) * 100 if base["p99_ms"] else 0.0
+            line += f"{d_ops:>+9.1f}%{d_p99:>+9.1f}%"
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="kanzi-bench-")
+    stubs = UpstreamStubs(latency=args.stub_latency_ms / 1000)
+    await stubs.start()
+    install_fake_yt_dlp(latency=args.extract_latency_ms / 1000)
+    kb = import_bot(workdir, stubs.environ())
+    if not args.real_limits:
+        lift_upstream_limits(kb)
+
+    guild, users, channel = build_world(kb, args.members, args.listeners, args.seeded_users)
+    ops = scenarios(kb, guild, users, channel)
+    selected = args.only or list(ops)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in selected:
+        await run_scenario(name, ops[name], min(args.warmup, args.iterations), args.concurrency)
+        results[name] = await run_scenario(name, ops[name], args.iterations, args.concurrency)
+    await stubs.stop()
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    print_table(results, baseline)
+
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "results": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(args.out, f"{stamp}-{revision}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}")
+
+    failing = [name for name, r in results.items() if r["errors"]]
+    if failing:
+        print(f"Scenarios with errors: {', '.join(failing)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Kanzi Bot command handlers offline")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--members", type=int, default=500, help="members in the fake guild")
+    parser.add_argument("--listeners", type=int, default=25, help="members sitting in the bot's voice channel")
+    parser.add_argument("--seeded-users", type=int, default=5000, help="entries in listening.json")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="simulated upstream latency")
+    parser.add_argument("--extract-latency-ms", type=float, default=50.0, help="simulated yt-dlp extraction time")
+    parser.add_argument("--real-limits", action="store_true", help="keep the production upstream rate limits")
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,406 @@
+# Fake Discord objects, local upstream stubs and a fake yt-dlp for offline runs
+# Only the attributes the bot's handlers touch are modelled.
+
+import asyncio
+import importlib
+import itertools
+import os
+import random
+import sys
+import time
+import types
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+_ids = itertools.count(10_000_000)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeVoiceState:
+    def __init__(self, channel: "FakeVoiceChannel", self_deaf: bool = False, deaf: bool = False,
+                 self_mute: bool = False, mute: bool = False):
+        self.channel = channel
+        self.self_deaf = self_deaf
+        self.deaf = deaf
+        self.self_mute = self_mute
+        self.mute = mute
+
+
+class FakeUser:
+    def __init__(self, user_id: Optional[int] = None, name: Optional[str] = None, bot: bool = False):
+        self.id = user_id or next_id()
+        self.name = name or f"user{self.id}"
+        self.display_name = self.name
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{self.id}.png")
+        self.voice: Optional[FakeVoiceState] = None
+        self.guild: Optional["FakeGuild"] = None
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild: "FakeGuild", name: str):
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.members: List[FakeUser] = []
+
+    async def connect(self) -> "FakeVoiceClient":
+        vc = FakeVoiceClient(self)
+        self.guild.voice_client = vc
+        return vc
+
+
+class FakeVoiceClient:
+    def __init__(self, channel: FakeVoiceChannel):
+        self.channel = channel
+        self.guild = channel.guild
+        self._playing = False
+        self._paused = False
+
+    def is_connected(self) -> bool:
+        return True
+
+    def is_playing(self) -> bool:
+        return self._playing
+
+    def is_paused(self) -> bool:
+        return self._paused
+
+    def play(self, source: Any, after=None) -> None:
+        self._playing = True
+        self._paused = False
+
+    def pause(self) -> None:
+        self._playing = False
+        self._paused = True
+
+    def resume(self) -> None:
+        self._playing = True
+        self._paused = False
+
+    def stop(self) -> None:
+        self._playing = False
+        self._paused = False
+
+    async def move_to(self, channel: FakeVoiceChannel) -> None:
+        self.channel = channel
+
+    async def disconnect(self, force: bool = False) -> None:
+        self.stop()
+        self.guild.voice_client = None
+
+
+class FakeGuild:
+    def __init__(self, name: Optional[str] = None):
+        self.id = next_id()
+        self.name = name or f"guild{self.id}"
+        self._members: Dict[int, FakeUser] = {}
+        self.voice_channels: List[FakeVoiceChannel] = []
+        self.voice_client: Optional[FakeVoiceClient] = None
+
+    @property
+    def members(self) -> List[FakeUser]:
+        return list(self._members.values())
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members)
+
+    def add_member(self, user: FakeUser) -> FakeUser:
+        user.guild = self
+        self._members[user.id] = user
+        return user
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return self._members.get(user_id)
+
+    async def query_members(self, user_ids: List[int], limit: int = 5, cache: bool = True) -> List[FakeUser]:
+        return [self._members[uid] for uid in user_ids[:limit] if uid in self._members]
+
+    def get_channel(self, channel_id: int) -> Optional[FakeVoiceChannel]:
+        for channel in self.voice_channels:
+            if channel.id == channel_id:
+                return channel
+        return None
+
+    def add_voice_channel(self, name: str) -> FakeVoiceChannel:
+        channel = FakeVoiceChannel(self, name)
+        self.voice_channels.append(channel)
+        return channel
+
+    def join_voice(self, user: FakeUser, channel: FakeVoiceChannel) -> None:
+        if user.voice and user in user.voice.channel.members:
+            user.voice.channel.members.remove(user)
+        user.voice = FakeVoiceState(channel)
+        channel.members.append(user)
+
+
+class FakeMessage:
+    def __init__(self, content: Optional[str] = None, embed: Any = None):
+        self.id = next_id()
+        self.content = content
+        self.embeds = [embed] if embed is not None else []
+        self.created_at = datetime.now(timezone.utc)
+
+    async def edit(self, **kwargs) -> "FakeMessage":
+        self.content = kwargs.get("content", self.content)
+        return self
+
+    async def delete(self) -> None:
+        pass
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content: Optional[str] = None, **kwargs) -> None:
+        self._done = True
+        self._interaction.sent.append(FakeMessage(content, kwargs.get("embed")))
+
+    async def defer(self, **kwargs) -> None:
+        self._done = True
+
+    async def edit_message(self, **kwargs) -> None:
+        self._done = True
+
+    async def send_autocomplete(self, choices: Any) -> None:
+        self._done = True
+        self._interaction.autocomplete = choices
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        message = FakeMessage(content, kwargs.get("embed"))
+        self._interaction.sent.append(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser, guild: Optional[FakeGuild] = None, data: Optional[Dict[str, Any]] = None):
+        self.id = next_id()
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id if guild else None
+        self.channel = None
+        self.message = None
+        self.data = data or {}
+        self.application_command = None
+        self.created_at = datetime.now(timezone.utc)
+        self.sent: List[FakeMessage] = []
+        self.autocomplete: Any = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_message(self, **kwargs) -> FakeMessage:
+        message = FakeMessage(kwargs.get("content"), kwargs.get("embed"))
+        self.sent.append(message)
+        return message
+
+    async def original_message(self) -> FakeMessage:
+        return self.sent[0] if self.sent else FakeMessage()
+
+
+class FakeCommand:
+    def __init__(self, name: str):
+        self.name = name
+        self.qualified_name = name
+
+
+class FakeContext:
+    def __init__(self, author: FakeUser, guild: Optional[FakeGuild] = None, command: str = "bench"):
+        self.author = author
+        self.guild = guild
+        self.message = FakeMessage()
+        self.command = FakeCommand(command)
+        self.command_failed = False
+        self.sent: List[FakeMessage] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        message = FakeMessage(content, kwargs.get("embed"))
+        self.sent.append(message)
+        return message
+
+    async def reply(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        return await self.send(content, **kwargs)
+
+
+class FakeBot:
+    """Stands in for the module-level `bot` where handlers read gateway state."""
+
+    def __init__(self, guilds: List[FakeGuild]):
+        self.guilds = guilds
+        self.user = FakeUser(name="Kanzi Bot", bot=True)
+        self.latency = 0.042
+        self._guilds_by_id = {g.id: g for g in guilds}
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self._guilds_by_id.get(guild_id)
+
+
+def install_fake_yt_dlp(latency: float = 0.0) -> None:
+    """Register a `yt_dlp` module whose extractor answers instantly (or after `latency`) without network."""
+
+    class YoutubeDL:
+        def __init__(self, opts: Optional[Dict[str, Any]] = None):
+            self.opts = opts or {}
+
+        def __enter__(self) -> "YoutubeDL":
+            return self
+
+        def __exit__(self, *exc) -> None:
+            return None
+
+        def extract_info(self, link: str, download: bool = False) -> Dict[str, Any]:
+            if latency:
+                time.sleep(latency)
+            if link.startswith(("scsearch", "ytsearch")):
+                prefix, _, query = link.partition(":")
+                count_str = prefix.replace("scsearch", "").replace("ytsearch", "")
+                count = int(count_str) if count_str.isdigit() else 1
+                return {"entries": [_track(f"{query} {i}") for i in range(count)]}
+            return _track(link)
+
+    def _track(seed: str) -> Dict[str, Any]:
+        track_id = str(abs(hash(seed)) % 10 ** 9)
+        return {
+            "id": track_id,
+            "title": f"Track {seed}",
+            "uploader": f"Artist {track_id[:3]}",
+            "duration": 180,
+            "url": f"http://127.0.0.1/audio/{track_id}.mp3",
+            "webpage_url": f"https://soundcloud.com/artist/{track_id}",
+            "thumbnail": None,
+        }
+
+    module = types.ModuleType("yt_dlp")
+    module.YoutubeDL = YoutubeDL
+    sys.modules["yt_dlp"] = module
+
+
+class UpstreamStubs:
+    """Local aiohttp server answering like Jikan, IGDB, the joke API, the meme API and the facts API."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.hits: Dict[str, int] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def _delay(self, name: str) -> None:
+        self.hits[name] = self.hits.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def jikan_anime(self, request: web.Request) -> web.Response:
+        await self._delay("jikan")
+        query = request.query.get("q", "")
+        genres = random.sample(["Action", "Drama", "Comedy", "Fantasy", "Romance", "Sci-Fi", "Slice of Life"], 2)
+        return web.json_response({"data": [{
+            "mal_id": abs(hash(query)) % 100000,
+            "title": query.title() or "Unknown",
+            "synopsis": "A benchmark anime. " * 20,
+            "score": round(random.uniform(5, 9.5), 2),
+            "episodes": 12,
+            "status": "Finished Airing",
+            "year": 2020,
+            "genres": [{"name": g} for g in genres],
+            "themes": [{"name": "School"}],
+            "demographics": [{"name": "Shounen"}],
+            "images": {"jpg": {"image_url": "https://cdn.example/anime.jpg"}},
+        }]})
+
+    async def igdb_games(self, request: web.Request) -> web.Response:
+        await self._delay("igdb")
+        return web.json_response([{
+            "name": "Benchmark Quest",
+            "summary": "A game used for benchmarks. " * 10,
+            "genres": [{"name": "RPG"}],
+            "platforms": [{"name": "PC"}],
+            "cover": {"url": "//cdn.example/cover.jpg"},
+        }])
+
+    async def joke(self, request: web.Request) -> web.Response:
+        await self._delay("joke")
+        return web.json_response({"setup": "Why do programmers prefer dark mode?", "punchline": "Because light attracts bugs."})
+
+    async def meme(self, request: web.Request) -> web.Response:
+        await self._delay("meme")
+        return web.json_response({"title": "Benchmark meme", "url": "https://cdn.example/meme.png"})
+
+    async def fact(self, request: web.Request) -> web.Response:
+        await self._delay("facts")
+        return web.json_response({"text": "Octopuses have three hearts."})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/jikan/anime", self.jikan_anime)
+        app.router.add_post("/igdb/games", self.igdb_games)
+        app.router.add_get("/joke/random_joke", self.joke)
+        app.router.add_get("/meme/gimme", self.meme)
+        app.router.add_get("/facts/random.json", self.fact)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    def environ(self) -> Dict[str, str]:
+        return {
+            "KANZI_JIKAN_URL": f"{self.base_url}/jikan",
+            "KANZI_IGDB_URL": f"{self.base_url}/igdb",
+            "KANZI_JOKE_URL": f"{self.base_url}/joke",
+            "KANZI_MEME_URL": f"{self.base_url}/meme",
+            "KANZI_FACTS_URL": f"{self.base_url}/facts",
+            "TWITCH_CLIENT_ID": "bench",
+            "TWITCH_ACCESS_TOKEN": "bench",
+        }
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def import_bot(data_root: str, environ: Dict[str, str]):
+    """Import kanzi_bot with its data and cache directories redirected to `data_root`."""
+    os.environ["KANZI_DATA_ROOT"] = os.path.join(data_root, "data")
+    os.environ["KANZI_CACHE_DIR"] = os.path.join(data_root, "cache")
+    os.environ.update(environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    kanzi_bot = importlib.import_module("kanzi_bot")
+    kanzi_bot.ensure_dirs()
+    return kanzi_bot
+
+
+def lift_upstream_limits(kanzi_bot) -> None:
+    """Replace every upstream token bucket with an effectively unlimited one and lift admission caps."""
+    for api in list(kanzi_bot.upstream_buckets):
+        kanzi_bot.upstream_buckets[api] = kanzi_bot.TokenBucket(1e9, 10 ** 9)
+    kanzi_bot.admission = kanzi_bot.AdmissionController(10 ** 9, 10 ** 9, 10 ** 9, kanzi_bot.ADMISSION_WAIT)
+
+
+async def invoke(command: Any, *args: Any) -> Any:
+    """Call a prefix or slash command's underlying handler."""
+    return await getattr(command, "callback", command)(*args)
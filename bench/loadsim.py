@@ -0,0 +1,249 @@
+# Synthetic load generator
+# Builds many fake guilds with voice channels full of listeners, then runs the
+# listening checkpoint and a configurable command mix against them.
+#
+#   python -m bench.loadsim --guilds 500 --channels 3 --listeners 20 --duration 60
+#   python -m bench.loadsim --mix profile=5,premium=3,leaderboard=2 --rps 100
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from bench.commands import percentile
+from bench.fakes import (
+    FakeBot,
+    FakeGuild,
+    FakeInteraction,
+    FakeUser,
+    import_bot,
+    install_fake_yt_dlp,
+    invoke,
+)
+
+
+def parse_mix(raw: str) -> Dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def build_world(guilds: int, channels: int, listeners: int, idle_members: int) -> List[FakeGuild]:
+    world = []
+    for g in range(guilds):
+        guild = FakeGuild(f"sim-{g}")
+        for c in range(channels):
+            channel = guild.add_voice_channel(f"voice-{c}")
+            for _ in range(listeners):
+                guild.join_voice(guild.add_member(FakeUser()), channel)
+        for _ in range(idle_members):
+            guild.add_member(FakeUser())
+        world.append(guild)
+    return world
+
+
+async def start_playback_everywhere(kb, world: List[FakeGuild]) -> None:
+    for guild in world:
+        vc = await guild.voice_channels[0].connect()
+        vc.play(None)
+        kb.refresh_listening_sessions(guild)
+
+
+class LoopLagProbe:
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+
+class WriteCounter:
+    """Wraps kanzi_bot.write_json and update_json to count persistent writes."""
+
+    def __init__(self, kb):
+        self.count = 0
+        original_write = kb.write_json
+        original_update = kb.update_json
+
+        def counting_write(path: str, data: Any) -> None:
+            self.count += 1
+            original_write(path, data)
+
+        def counting_update(path: str, default: Any, fn: Callable[[Any], Any]) -> Any:
+            self.count += 1
+            return original_update(path, default, fn)
+
+        kb.write_json = counting_write
+        kb.update_json = counting_update
+
+
+def traffic_ops(kb, world: List[FakeGuild]) -> Dict[str, Callable[[], Any]]:
+    def pick():
+        guild = random.choice(world)
+        return guild, random.choice(guild.members)
+
+    def profile():
+        guild, user = pick()
+        return invoke(kb.slash_profile, FakeInteraction(user, guild))
+
+    def premium():
+        guild, user = pick()
+        return invoke(kb.slash_premium_status, FakeInteraction(user, guild))
+
+    def leaderboard():
+        guild, user = pick()
+        return invoke(kb.slash_leaderboard, FakeInteraction(user, guild), "all")
+
+    return {"profile": profile, "premium": premium, "leaderboard": leaderboard}
+
+
+async def generate_traffic(ops: Dict[str, Callable[[], Any]], mix: Dict[str, float], rps: float,
+                           latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    pending = set()
+
+    async def one(name: str) -> None:
+        started = time.perf_counter()
+        try:
+            await ops[name]()
+        except Exception:
+            if name not in errors:
+                print(f"{name}: first error (later ones are only counted)", file=sys.stderr)
+                traceback.print_exc()
+            errors[name] = errors.get(name, 0) + 1
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+    try:
+        while True:
+            name = random.choices(names, weights)[0]
+            task = asyncio.create_task(one(name))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            await asyncio.sleep(1 / rps)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    install_fake_yt_dlp()
+    kb = import_bot(tempfile.mkdtemp(prefix="kanzi-loadsim-"), {})
+
+    tracemalloc.start()
+    mem_before = tracemalloc.get_traced_memory()[0]
+    build_started = time.perf_counter()
+    world = build_world(args.guilds, args.channels, args.listeners, args.idle_members)
+    kb.bot = FakeBot(world)
+    await start_playback_everywhere(kb, world)
+    build_seconds = time.perf_counter() - build_started
+    mem_world = tracemalloc.get_traced_memory()[0]
+
+    writes = WriteCounter(kb)
+    probe = LoopLagProbe()
+    probe_task = asyncio.create_task(probe.run())
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    traffic_task = None
+    if args.rps > 0:
+        traffic_task = asyncio.create_task(generate_traffic(traffic_ops(kb, world), parse_mix(args.mix), args.rps, latencies, errors))
+
+    ticks: List[Dict[str, float]] = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        writes_before = writes.count
+        started = time.perf_counter()
+        await kb.start_listening_tracker.coro()
+        ticks.append({"seconds": time.perf_counter() - started, "writes": writes.count - writes_before})
+        await asyncio.sleep(args.tick_interval)
+
+    if traffic_task:
+        traffic_task.cancel()
+    probe_task.cancel()
+    await asyncio.gather(*(t for t in (traffic_task, probe_task) if t), return_exceptions=True)
+    mem_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tick_seconds = sorted(t["seconds"] for t in ticks)
+    lag = sorted(probe.samples)
+    report = {
+        "config": vars(args),
+        "world": {
+            "guilds": args.guilds,
+            "voice_members": args.guilds * args.channels * args.listeners,
+            "build_seconds": round(build_seconds, 3),
+        },
+        "tracker": {
+            "ticks": len(ticks),
+            "p50_ms": round(percentile(tick_seconds, 50) * 1000, 3),
+            "p99_ms": round(percentile(tick_seconds, 99) * 1000, 3),
+            "max_ms": round(tick_seconds[-1] * 1000, 3) if tick_seconds else 0.0,
+            "writes_per_tick": round(sum(t["writes"] for t in ticks) / len(ticks), 1) if ticks else 0.0,
+        },
+        "commands": {
+            name: {
+                "count": len(vals),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(sorted(vals), 50) * 1000, 3),
+                "p99_ms": round(percentile(sorted(vals), 99) * 1000, 3),
+            }
+            for name, vals in latencies.items()
+        },
+        "memory": {
+            "world_bytes": mem_world - mem_before,
+            "per_guild_bytes": round((mem_world - mem_before) / max(1, args.guilds)),
+            "growth_during_run_bytes": mem_after - mem_world,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "loop_lag": {
+            "p50_ms": round(percentile(lag, 50) * 1000, 3),
+            "p99_ms": round(percentile(lag, 99) * 1000, 3),
+            "max_ms": round(lag[-1] * 1000, 3) if lag else 0.0,
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failing = [name for name, count in errors.items() if count]
+    if failing:
+        print(f"Commands with errors: {', '.join(sorted(failing))}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulate Kanzi Bot load across many guilds")
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--channels", type=int, default=2, help="voice channels per guild")
+    parser.add_argument("--listeners", type=int, default=10, help="listeners per voice channel")
+    parser.add_argument("--idle-members", type=int, default=50, help="members per guild not in voice")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--tick-interval", type=float, default=1.0, help="seconds between tracker ticks (60 in production)")
+    parser.add_argument("--rps", type=float, default=20.0, help="command requests per second")
+    parser.add_argument("--mix", default="profile=5,premium=3,leaderboard=2")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="also write the report to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
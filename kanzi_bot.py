@@ -3,27 +3,51 @@
 # Author: Shariar Mahmud Saif
 # License: MIT
 
+import time
+_import_started = time.perf_counter()
+
+import io
 import os
 import json
 import asyncio
 import aiohttp
 import re
+import random
+import sys
+import collections
+import threading
+import traceback
+import contextlib
+import contextvars
+import functools
+import bisect
+import heapq
+import itertools
+import math
+import hashlib
+import shutil
+import signal
+import subprocess
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows: JSON store falls back to an in-process lock
+    fcntl = None
+
+# Optional integrations (openai, spotipy, yt_dlp, psutil) are imported on first use
+# or by warm_up_integrations() after the gateway is ready.
 import logging
 import structlog
 from diskcache import Cache
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import wavelink
-import requests
-import openai
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 import nextcord
 from nextcord.ext import commands, tasks
+STARTUP_TIMINGS: Dict[str, float] = {"import": time.perf_counter() - _import_started}
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-DATA_ROOT = os.path.join(PROJECT_ROOT, "data")
+DATA_ROOT = os.getenv("KANZI_DATA_ROOT") or os.path.join(PROJECT_ROOT, "data")
 PROFILES_DIR = os.path.join(DATA_ROOT, "profiles")
 BANNERS_DIR = os.path.join(DATA_ROOT, "banners")
 MUSIC_DIR = os.path.join(DATA_ROOT, "music")
@@ -51,6 +75,181 @@ NEUTRAL_THEME = "neutral"
 
 FILENAME_SAFE_RE = re.compile(r"[^a-zA-Z0-9_.-]")
 
+# Sharding: launch() sets these for each cluster process; unset runs every shard in one process
+SHARD_COUNT = int(os.getenv("KANZI_SHARD_COUNT") or 0) or None
+SHARD_IDS = [int(i) for i in os.getenv("KANZI_SHARD_IDS", "").split(",") if i.strip()] or None
+CLUSTER_ID = os.getenv("KANZI_CLUSTER_ID")
+
+
+# Tracing: one trace per interaction/command, carried through contextvars
+TRACES_DIR = os.path.join(DATA_ROOT, "traces")
+TRACE_FILE = os.path.join(TRACES_DIR, f"spans-{CLUSTER_ID}.jsonl" if CLUSTER_ID else "spans.jsonl")
+TRACE_FILE_MAX_BYTES = 50 * 1024 * 1024
+TRACE_SLOW_SECONDS = float(os.getenv("KANZI_TRACE_SLOW_MS", "1000")) / 1000
+TRACE_SAMPLE_RATE = float(os.getenv("KANZI_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_MAX_SPANS = 256
+# One writer thread keeps trace appends and rotation ordered and off the event loop
+TRACE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kanzi-trace")
+
+current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("kanzi_trace", default=None)
+current_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("kanzi_span", default=None)
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+class Trace:
+    """Spans collected for one interaction; exported only when slow, failed or sampled."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.root_span_id = os.urandom(8).hex()
+        self.name = name
+        self.attributes = attributes
+        self.started_ns = time.time_ns()
+        self.spans: List[Dict[str, Any]] = []
+        self.failed = False
+
+    def add_span(self, span_id: str, parent_id: Optional[str], name: str, start_ns: int, end_ns: int,
+                 attributes: Dict[str, Any], error: bool) -> None:
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            return
+        self.failed = self.failed or error
+        self.spans.append({
+            "traceId": self.trace_id,
+            "spanId": span_id,
+            "parentSpanId": parent_id or "",
+            "name": name,
+            "kind": 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": _otlp_attributes(attributes),
+            "status": {"code": 2 if error else 1},
+        })
+
+
+def add_trace_context(logger, method_name, event_dict):
+    """structlog processor that stamps log lines with the active trace and span IDs."""
+    trace = current_trace.get()
+    if trace is not None:
+        event_dict.setdefault("trace_id", trace.trace_id)
+        event_dict.setdefault("span_id", current_span_id.get())
+    return event_dict
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = os.urandom(8).hex()
+    parent_id = current_span_id.get()
+    token = current_span_id.set(span_id)
+    start_ns = time.time_ns()
+    error = False
+    try:
+        yield
+    except BaseException as e:
+        error = not isinstance(e, asyncio.CancelledError)
+        attributes["error"] = str(e)
+        raise
+    finally:
+        current_span_id.reset(token)
+        trace.add_span(span_id, parent_id, name, start_ns, time.time_ns(), attributes, error)
+
+
+def start_trace(name: str, **attributes: Any) -> Trace:
+    trace = Trace(name, attributes)
+    current_trace.set(trace)
+    current_span_id.set(trace.root_span_id)
+    return trace
+
+
+def end_trace(trace: Trace, error: bool = False) -> None:
+    if current_trace.get() is trace:
+        current_trace.set(None)
+        current_span_id.set(None)
+    end_ns = time.time_ns()
+    trace.add_span(trace.root_span_id, None, trace.name, trace.started_ns, end_ns, trace.attributes, error)
+    duration = (end_ns - trace.started_ns) / 1e9
+    if trace.failed or duration >= TRACE_SLOW_SECONDS or random.random() < TRACE_SAMPLE_RATE:
+        export_trace(trace)
+        if duration >= TRACE_SLOW_SECONDS:
+            logger.info("Slow trace", trace_id=trace.trace_id, name=trace.name, duration_ms=round(duration * 1000, 1), spans=len(trace.spans))
+
+
+def export_trace(trace: Trace) -> None:
+    """Queue the finished trace for TRACE_POOL to append."""
+    TRACE_POOL.submit(write_trace, list(trace.spans))
+
+
+def write_trace(spans: List[Dict[str, Any]]) -> None:
+    """Append the spans as one OTLP/JSON line (readable by the collector's otlpjsonfile receiver)."""
+    record = {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": "kanzi-bot"})},
+        "scopeSpans": [{"scope": {"name": "kanzi_bot"}, "spans": spans}],
+    }]}
+    try:
+        if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_FILE_MAX_BYTES:
+            os.replace(TRACE_FILE, TRACE_FILE + ".1")
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        logger.warning("Trace export failed", error=str(e))
+
+
+@contextlib.contextmanager
+def trace_interaction(name: str, **attributes: Any):
+    trace = start_trace(name, **attributes)
+    error = False
+    try:
+        yield trace
+    except Exception:
+        error = True
+        raise
+    finally:
+        end_trace(trace, error)
+
+
+class TracedCache(Cache):
+    """diskcache.Cache that records a span for every lookup and write."""
+
+    def __contains__(self, key):
+        with span("cache.contains", key=str(key)):
+            return super().__contains__(key)
+
+    def __getitem__(self, key):
+        with span("cache.get", key=str(key)):
+            return super().__getitem__(key)
+
+    def get(self, key, *args, **kwargs):
+        with span("cache.get", key=str(key)):
+            return super().get(key, *args, **kwargs)
+
+    def set(self, key, *args, **kwargs):
+        with span("cache.set", key=str(key)):
+            return super().set(key, *args, **kwargs)
+
+    def add(self, key, *args, **kwargs):
+        with span("cache.add", key=str(key)):
+            return super().add(key, *args, **kwargs)
+
+    def incr(self, key, *args, **kwargs):
+        with span("cache.incr", key=str(key)):
+            return super().incr(key, *args, **kwargs)
+
 
 # Setup logging
 structlog.configure(
@@ -58,6 +257,7 @@ structlog.configure(
         structlog.stdlib.filter_by_level,
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
+        add_trace_context,
         structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
@@ -74,15 +274,41 @@ structlog.configure(
 logger = structlog.get_logger()
 
 # Setup caching
-cache = Cache(os.path.join(PROJECT_ROOT, "cache"))
+cache = TracedCache(os.getenv("KANZI_CACHE_DIR") or os.path.join(PROJECT_ROOT, "cache"))
 
 # Setup metrics
 REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['api', 'status'])
 REQUEST_LATENCY = Histogram('api_request_duration_seconds', 'API request latency', ['api'])
+REQUEST_WAIT = Histogram('api_request_wait_seconds', 'Time spent queued in the upstream rate limiter', ['api'])
+REQUEST_CIRCUIT_STATE = Gauge('api_request_circuit_state', 'Upstream circuit breaker state (0=closed, 1=half-open, 2=open)', ['api'])
+COMMAND_LATENCY = Histogram('command_duration_seconds', 'End-to-end command latency from the triggering message or interaction', ['kind', 'command'])
+COMMAND_COUNT = Counter('command_total', 'Commands handled, by outcome', ['kind', 'command', 'outcome'])
+INTERACTION_ACK_LATENCY = Histogram(
+    'interaction_ack_seconds',
+    'Time from interaction creation to the first response',
+    ['command'],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0),
+)
+INTERACTION_ACK_LATE = Counter('interaction_ack_late_total', 'Interactions acknowledged after the 3s deadline', ['command'])
+EVENT_LOOP_LAG = Gauge('event_loop_lag_seconds', 'Delay between when the event loop should wake a task and when it does')
+STARTUP_PHASE = Gauge('startup_phase_seconds', 'Time spent in each cold start phase', ['phase'])
+STARTUP_PHASE.labels(phase='import').set(STARTUP_TIMINGS['import'])
+
 
-# API clients
+@contextlib.contextmanager
+def startup_phase(name: str):
+    """Time one cold start phase into STARTUP_TIMINGS and the startup gauge"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = time.perf_counter() - started
+        STARTUP_PHASE.labels(phase=name).set(STARTUP_TIMINGS[name])
+
+# API clients, created on first use by get_spotify_client() / get_openai()
 spotify_client = None
 audiodb_client = None
+_openai_module = None
 
 def safe_filename(name: str) -> str:
     return FILENAME_SAFE_RE.sub("_", name)[:128]
@@ -101,6 +327,9 @@ def ensure_dirs() -> None:
         QUIZZES_DIR,
         CANVAS_DIR,
         CANVAS_COLLAB_DIR,
+        TRACES_DIR,
+        CARDS_DIR,
+        ANIME_DIR,
     ]:
         os.makedirs(path, exist_ok=True)
     for fpath, default in [
@@ -116,46 +345,179 @@ def ensure_dirs() -> None:
                 json.dump(default, f, indent=2)
 
 
-class MusicControls(nextcord.ui.View):
-    def __init__(self, vc: nextcord.VoiceClient):
+INTERACTION_ACK_DEADLINE = 3.0
+LOOP_LAG_INTERVAL = 0.5
+
+
+def seconds_since(created_at: datetime) -> float:
+    return max(0.0, (datetime.now(timezone.utc) - created_at).total_seconds())
+
+
+def interaction_command_name(interaction: nextcord.Interaction) -> str:
+    app_cmd = getattr(interaction, "application_command", None)
+    if app_cmd is not None:
+        return getattr(app_cmd, "qualified_name", None) or app_cmd.name
+    data = interaction.data or {}
+    return data.get("custom_id") or data.get("name") or "unknown"
+
+
+def record_command(kind: str, name: str, created_at: datetime, outcome: str) -> None:
+    COMMAND_LATENCY.labels(kind=kind, command=name).observe(seconds_since(created_at))
+    COMMAND_COUNT.labels(kind=kind, command=name, outcome=outcome).inc()
+
+
+def _instrument_interaction_responses() -> None:
+    """Record time-to-acknowledge whenever an interaction gets its first response."""
+
+    def wrap(original):
+        async def wrapper(self, *args, **kwargs):
+            interaction = getattr(self, "_parent", None)
+            first = interaction is not None and not self.is_done()
+            result = await original(self, *args, **kwargs)
+            if first:
+                name = interaction_command_name(interaction)
+                elapsed = seconds_since(interaction.created_at)
+                INTERACTION_ACK_LATENCY.labels(command=name).observe(elapsed)
+                if elapsed > INTERACTION_ACK_DEADLINE:
+                    INTERACTION_ACK_LATE.labels(command=name).inc()
+            return result
+        wrapper.__name__ = original.__name__
+        wrapper.__doc__ = original.__doc__
+        return wrapper
+
+    for method in ("send_message", "defer", "edit_message", "send_modal", "send_autocomplete"):
+        original = getattr(nextcord.InteractionResponse, method, None)
+        if original is not None:
+            setattr(nextcord.InteractionResponse, method, wrap(original))
+
+
+_instrument_interaction_responses()
+
+
+# Button handler code objects -> "View.method", used to attribute loop stalls
+COMPONENT_CODE_NAMES: Dict[Any, str] = {}
+
+
+def instrument_component(view_name: str, callback):
+    func = getattr(callback, "func", callback)
+    name = f"{view_name}.{getattr(func, '__name__', 'item')}"
+    if hasattr(func, "__code__"):
+        COMPONENT_CODE_NAMES[func.__code__] = name
+
+    async def wrapped(interaction: nextcord.Interaction):
+        outcome = "ok"
+        try:
+            with trace_interaction(name, guild=str(interaction.guild_id), user=str(interaction.user.id)):
+                await callback(interaction)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            record_command("component", name, interaction.created_at, outcome)
+    return wrapped
+
+
+class InstrumentedView(nextcord.ui.View):
+    """View whose item callbacks report latency and outcome like commands do."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in self.children:
+            item.callback = instrument_component(type(self).__name__, item.callback)
+
+
+class PersistentView(InstrumentedView):
+    """Registered once at startup with bot.add_view. Buttons carry stable custom_ids and handlers
+    act on interaction.guild / interaction.user, so nothing is kept per message and old messages
+    keep working after a restart."""
+
+    _shared: Dict[type, nextcord.ui.View] = {}
+
+    def __init__(self):
         super().__init__(timeout=None)
-        self.vc = vc
 
-    @nextcord.ui.button(label="⏸️ Pause", style=nextcord.ButtonStyle.secondary)
+    @property
+    def timeout(self) -> None:
+        return None
+
+    @timeout.setter
+    def timeout(self, value: Optional[float]) -> None:
+        # InteractionResponse.send_message gives ephemeral views a 15 minute timeout;
+        # the registered instance is shared by every message and must never expire.
+        pass
+
+    @classmethod
+    def shared(cls) -> nextcord.ui.View:
+        """The one instance registered with bot.add_view; every message with these buttons sends it"""
+        view = PersistentView._shared.get(cls)
+        if view is None:
+            view = PersistentView._shared[cls] = cls()
+        return view
+
+
+def untrack_panel_message(message: Optional[nextcord.Message]) -> None:
+    """Messageable.send files a per-message copy of the view's routes; the registered
+    message_id=None routes already serve every message, so drop the copy instead of
+    keeping one per sent panel."""
+    # ViewStore is private nextcord state; leave the routes alone if its shape is not the one we expect
+    store = getattr(getattr(bot, "_connection", None), "_view_store", None)
+    synced = getattr(store, "_synced_message_views", None)
+    routes = getattr(store, "_views", None)
+    if message is None or not isinstance(synced, dict) or not isinstance(routes, dict):
+        return
+    view = synced.pop(message.id, None)
+    if view is None:
+        return
+    for item in view.children:
+        if item.is_dispatchable():
+            routes.pop((item.type.value, message.id, item.custom_id), None)
+
+
+def guild_voice_client(interaction: nextcord.Interaction) -> Optional[nextcord.VoiceClient]:
+    return interaction.guild.voice_client if interaction.guild else None
+
+
+class MusicControls(PersistentView):
+    @nextcord.ui.button(label="⏸️ Pause", style=nextcord.ButtonStyle.secondary, custom_id="kanzi:music:pause")
     async def pause_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        if self.vc and self.vc.is_playing():
-            self.vc.pause()
+        vc = guild_voice_client(interaction)
+        if vc and vc.is_playing():
+            vc.pause()
+            refresh_listening_sessions(vc.guild)
             await interaction.response.send_message("⏸️ Paused!", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Nothing is playing.", ephemeral=True)
 
-    @nextcord.ui.button(label="▶️ Resume", style=nextcord.ButtonStyle.secondary)
+    @nextcord.ui.button(label="▶️ Resume", style=nextcord.ButtonStyle.secondary, custom_id="kanzi:music:resume")
     async def resume_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        if self.vc and self.vc.is_paused():
-            self.vc.resume()
+        vc = guild_voice_client(interaction)
+        if vc and vc.is_paused():
+            vc.resume()
+            refresh_listening_sessions(vc.guild)
             await interaction.response.send_message("▶️ Resumed!", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Not paused.", ephemeral=True)
 
-    @nextcord.ui.button(label="⏹️ Stop", style=nextcord.ButtonStyle.danger)
+    @nextcord.ui.button(label="⏹️ Stop", style=nextcord.ButtonStyle.danger, custom_id="kanzi:music:stop")
     async def stop_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        if self.vc and (self.vc.is_playing() or self.vc.is_paused()):
-            self.vc.stop()
+        vc = guild_voice_client(interaction)
+        if vc and (vc.is_playing() or vc.is_paused()):
+            vc.stop()
             await interaction.response.send_message("⏹️ Stopped!", ephemeral=True)
         else:
             await interaction.response.send_message("❌ Nothing is playing.", ephemeral=True)
 
-    @nextcord.ui.button(label="🔊 Vol +", style=nextcord.ButtonStyle.primary)
+    @nextcord.ui.button(label="🔊 Vol +", style=nextcord.ButtonStyle.primary, custom_id="kanzi:music:vol_up")
     async def vol_up_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
         await interaction.response.send_message("🔊 Volume control not available with current setup.", ephemeral=True)
 
-    @nextcord.ui.button(label="🔉 Vol -", style=nextcord.ButtonStyle.primary)
+    @nextcord.ui.button(label="🔉 Vol -", style=nextcord.ButtonStyle.primary, custom_id="kanzi:music:vol_down")
     async def vol_down_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
         await interaction.response.send_message("🔉 Volume control not available with current setup.", ephemeral=True)
 
-    @nextcord.ui.button(label="❓ Help", style=nextcord.ButtonStyle.secondary)
+    @nextcord.ui.button(label="❓ Help", style=nextcord.ButtonStyle.secondary, custom_id="kanzi:music:help")
     async def help_button(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        embed = build_help_embed()
+        embed = help_embed()
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -186,50 +548,398 @@ def auto_solve_playback(link):
     raise Exception("All 5 auto-solve steps failed. Unable to play this track.")
 
 
-def read_json(path: str, default: Any) -> Any:
+# Voice pipeline
+EXTRACT_WORKERS = int(os.getenv("KANZI_EXTRACT_WORKERS", "4"))
+EXTRACT_POOL = ThreadPoolExecutor(max_workers=EXTRACT_WORKERS, thread_name_prefix="kanzi-extract")
+AUDIO_FRAME_SECONDS = 0.02
+
+VOICE_STAGE_LATENCY = Histogram('voice_stage_duration_seconds', 'Playback pipeline stage duration', ['stage'])
+VOICE_TIME_TO_FIRST_AUDIO = Histogram('voice_time_to_first_audio_seconds', 'Time from command start to the first audio packet', ['command'])
+# No guild label: one series per guild is unbounded under sharding, so per-guild detail goes to logs
+VOICE_PLAY_ERRORS = Counter('voice_play_errors_total', 'Playback errors reported by the audio player')
+FFMPEG_PROCESSES = Gauge('ffmpeg_processes', 'FFmpeg processes currently feeding voice playback')
+FFMPEG_CPU = Gauge('ffmpeg_cpu_percent', 'Combined CPU use of the FFmpeg processes feeding voice playback')
+FFMPEG_RSS = Gauge('ffmpeg_rss_bytes', 'Combined resident memory of the FFmpeg processes feeding voice playback')
+
+# guild id -> what is playing there, read by /nowplaying and the FFmpeg sampler
+NOW_PLAYING: Dict[int, Dict[str, Any]] = {}
+
+
+def extract_info(link: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    import yt_dlp
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        return ydl.extract_info(link, download=False)
+
+
+async def run_extraction(func, *args) -> Any:
+    """Run a blocking yt-dlp call on the extraction pool instead of the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXTRACT_POOL, functools.partial(func, *args))
+
+
+@contextlib.contextmanager
+def voice_stage(stage: str, timings: Dict[str, float]):
+    started = time.perf_counter()
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        VOICE_STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        timings[stage] = round(elapsed, 3)
+
+
+class MeteredAudioSource(nextcord.AudioSource):
+    """Wraps an FFmpeg source to time the first packet and track the playback position."""
+
+    def __init__(self, original: nextcord.FFmpegPCMAudio, command: str, started: float, timings: Dict[str, float],
+                 offset: float = 0.0):
+        self.original = original
+        self.command = command
+        self.started = started
+        self.timings = timings
+        self.offset = offset
+        self.play_started = time.perf_counter()
+        self.frames = 0
+
+    def read(self) -> bytes:
+        data = self.original.read()
+        if data:
+            if self.frames == 0:
+                now = time.perf_counter()
+                VOICE_STAGE_LATENCY.labels(stage="first_packet").observe(now - self.play_started)
+                VOICE_TIME_TO_FIRST_AUDIO.labels(command=self.command).observe(now - self.started)
+                self.timings["first_packet"] = round(now - self.play_started, 3)
+                self.timings["total"] = round(now - self.started, 3)
+            self.frames += 1
+        return data
+
+    def is_opus(self) -> bool:
+        return self.original.is_opus()
+
+    def cleanup(self) -> None:
+        self.original.cleanup()
+
+    @property
+    def position(self) -> float:
+        return self.offset + self.frames * AUDIO_FRAME_SECONDS
+
+    @property
+    def process(self):
+        return getattr(self.original, "_process", None)
+
+
+async def connect_voice(guild: nextcord.Guild, channel: nextcord.VoiceChannel, timings: Dict[str, float]) -> nextcord.VoiceClient:
+    vc: Optional[nextcord.VoiceClient] = guild.voice_client
+    with voice_stage("connect", timings):
+        if vc and vc.is_connected():
+            if vc.channel != channel:
+                await vc.move_to(channel)
+        else:
+            vc = await channel.connect()
+    return vc
+
+
+def playback_finished(vc: nextcord.VoiceClient, source: MeteredAudioSource):
+    guild_id = vc.guild.id
+    loop = asyncio.get_running_loop()
+
+    def after(error: Optional[Exception]) -> None:
+        # Runs on the audio player thread
+        if error:
+            VOICE_PLAY_ERRORS.inc()
+            logger.error("Playback error", guild=guild_id, error=str(error))
+        entry = NOW_PLAYING.get(guild_id)
+        if entry and entry["source"] is source:
+            NOW_PLAYING.pop(guild_id, None)
+        loop.call_soon_threadsafe(refresh_listening_sessions, vc.guild)
+    return after
+
+
+def start_playback(vc: nextcord.VoiceClient, stream: str, *, title: str, link: str, kind: str,
+                   requested_by: int, command: str, started: float, timings: Dict[str, float],
+                   seek: float = 0.0) -> MeteredAudioSource:
+    if vc.is_playing():
+        vc.stop()
+    with voice_stage("source_open", timings):
+        ffmpeg = nextcord.FFmpegPCMAudio(stream, before_options=f"-ss {seek:.2f}") if seek else nextcord.FFmpegPCMAudio(stream)
+    source = MeteredAudioSource(ffmpeg, command, started, timings, offset=seek)
+    guild_id = vc.guild.id
+    NOW_PLAYING[guild_id] = {
+        "title": title,
+        "link": link,
+        "kind": kind,
+        "requested_by": requested_by,
+        "channel_id": vc.channel.id,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "timings": timings,
+    }
+    vc.play(source, after=playback_finished(vc, source))
+    refresh_listening_sessions(vc.guild)
+    return source
+
+
+@tasks.loop(seconds=15)
+async def sample_ffmpeg_usage():
+    try:
+        import psutil
+    except ImportError:
+        return
+    processes, cpu, rss = 0, 0.0, 0
+    for guild_id, entry in list(NOW_PLAYING.items()):
+        proc = entry["source"].process
+        if proc is None:
+            continue
+        try:
+            ps = entry.get("ps")
+            if ps is None or ps.pid != proc.pid:
+                ps = entry["ps"] = psutil.Process(proc.pid)
+            proc_cpu, proc_rss = ps.cpu_percent(None), ps.memory_info().rss
+        except psutil.Error:
+            continue
+        logger.debug("FFmpeg usage", guild=guild_id, cpu_percent=proc_cpu, rss_bytes=proc_rss)
+        processes += 1
+        cpu += proc_cpu
+        rss += proc_rss
+    FFMPEG_PROCESSES.set(processes)
+    FFMPEG_CPU.set(cpu)
+    FFMPEG_RSS.set(rss)
+
+
+GATEWAY_GUILDS = Gauge('gateway_guilds', 'Guilds held by this process')
+GATEWAY_CACHED_MEMBERS = Gauge('gateway_cached_members', 'Member objects held in the gateway cache')
+PROCESS_RSS_PER_GUILD = Gauge('process_rss_per_guild_bytes', 'Resident memory of this process divided by its guild count')
+
+
+@tasks.loop(seconds=60)
+async def sample_gateway_memory():
+    guilds = bot.guilds
+    GATEWAY_GUILDS.set(len(guilds))
+    GATEWAY_CACHED_MEMBERS.set(sum(len(g.members) for g in guilds))
+    try:
+        import psutil
+    except ImportError:
+        return
+    PROCESS_RSS_PER_GUILD.set(psutil.Process().memory_info().rss / max(1, len(guilds)))
+
+
+def now_playing_embed(guild_id: int) -> Optional[nextcord.Embed]:
+    entry = NOW_PLAYING.get(guild_id)
+    if not entry:
+        return None
+    source: MeteredAudioSource = entry["source"]
+    desc = f"[{entry['title']}]({entry['link']})" if entry["link"].startswith(("http://", "https://")) else entry["title"]
+    embed = nextcord.Embed(title="🎵 Now Playing", description=desc, color=0x00FF00)
+    embed.add_field(name="Position", value=human_time(int(source.position)), inline=True)
+    embed.add_field(name="Requested by", value=f"<@{entry['requested_by']}>", inline=True)
+    timings = entry["timings"]
+    stages = " • ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+    if stages:
+        embed.add_field(name="Startup", value=stages, inline=False)
+    return embed
+
+class JsonFileStore:
+    """Documents as JSON files under DATA_ROOT; update() holds an flock so clusters on one host don't race."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def get(self, path: str, default: Any) -> Any:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return default
+
+    def set(self, path: str, data: Any) -> None:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+
+    def update(self, path: str, default: Any, fn) -> Any:
+        with self._lock, open(path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            data = fn(self.get(path, default))
+            self.set(path, data)
+            return data
+
+    def version(self, path: str) -> int:
+        # set() always lands a new inode via os.replace, so the inode changes even within one mtime tick
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0
+        return hash((st.st_ino, st.st_mtime_ns, st.st_size))
+
+
+class SqliteStore:
+    """Documents as rows in one SQLite database (WAL), shared by every process on the host."""
+
+    def __init__(self, db_path: str):
+        import sqlite3
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, value TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(documents)")}
+        if "version" not in columns:
+            self._db.execute("ALTER TABLE documents ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def get(self, path: str, default: Any) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM documents WHERE key = ?", (store_key(path),)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    _UPSERT = (
+        "INSERT INTO documents (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = documents.version + 1"
+    )
+
+    def set(self, path: str, data: Any) -> None:
+        with self._lock:
+            self._db.execute(self._UPSERT, (store_key(path), json.dumps(data)))
+
+    def update(self, path: str, default: Any, fn) -> Any:
+        key = store_key(path)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT value FROM documents WHERE key = ?", (key,)).fetchone()
+                data = fn(json.loads(row[0]) if row else default)
+                self._db.execute(self._UPSERT, (key, json.dumps(data)))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return data
+
+    def version(self, path: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM documents WHERE key = ?", (store_key(path),)).fetchone()
+        return row[0] + 1 if row else 0
+
+
+class RedisStore:
+    """Documents as JSON strings in Redis (or any server speaking its protocol), for clusters on several hosts."""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, path: str, default: Any) -> Any:
+        raw = self._redis.get(f"kanzi:{store_key(path)}")
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, path: str, data: Any) -> None:
+        key = store_key(path)
+        pipe = self._redis.pipeline()
+        pipe.set(f"kanzi:{key}", json.dumps(data))
+        pipe.incr(f"kanzi:version:{key}")
+        pipe.execute()
+
+    def update(self, path: str, default: Any, fn) -> Any:
+        key = f"kanzi:{store_key(path)}"
+        result = {}
+
+        def txn(pipe):
+            raw = pipe.get(key)
+            result["data"] = fn(json.loads(raw) if raw is not None else default)
+            pipe.multi()
+            pipe.set(key, json.dumps(result["data"]))
+            pipe.incr(f"kanzi:version:{store_key(path)}")
+
+        self._redis.transaction(txn, key)
+        return result["data"]
+
+    def version(self, path: str) -> int:
+        return int(self._redis.get(f"kanzi:version:{store_key(path)}") or 0)
+
+
+def store_key(path: str) -> str:
+    return os.path.relpath(path, DATA_ROOT).replace(os.sep, "/")
+
+
+def open_store():
+    """Pick the document store from KANZI_STORE (json, sqlite or redis)"""
+    kind = os.getenv("KANZI_STORE", "json").lower()
+    if kind == "sqlite":
+        os.makedirs(DATA_ROOT, exist_ok=True)
+        return SqliteStore(os.getenv("KANZI_STORE_URL") or os.path.join(DATA_ROOT, "kanzi.db"))
+    if kind == "redis":
+        return RedisStore(os.getenv("KANZI_STORE_URL", "redis://localhost:6379/0"))
+    return JsonFileStore()
+
+
+STORE = open_store()
+
+
+def read_json(path: str, default: Any) -> Any:
+    with span("file.read", path=store_key(path)):
+        try:
+            return STORE.get(path, default)
+        except Exception:
+            return default
 
 
 def write_json(path: str, data: Any) -> None:
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp, path)
+    with span("file.write", path=store_key(path)):
+        STORE.set(path, data)
+
+
+def update_json(path: str, default: Any, fn) -> Any:
+    """Atomically replace the document at `path` with fn(current) and return the new value"""
+    with span("file.update", path=store_key(path)):
+        return STORE.update(path, default, fn)
+
+
+def document_version(path: str) -> int:
+    """Changes whenever the document at `path` is written, by any process sharing the store"""
+    return STORE.version(path)
 
 
 def profile_path(user_id: int) -> str:
     return os.path.join(PROFILES_DIR, f"{user_id}.json")
 
 
+def default_profile(user_id: int) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "premium": False,
+        "premium_preview_until": None,
+        "premium_unlocked_by_reward": False,
+        "theme": NEUTRAL_THEME,
+        "badges": [],
+        "nickname": None,
+        "status_text": None,
+        "emoji_flair": None,
+        "accent_color": None,
+        "quote": None,
+        "frame": None,
+        "banner_file": None,
+        "banner_url": None,
+    }
+
+
 def load_profile(user_id: int) -> Dict[str, Any]:
-    path = profile_path(user_id)
-    prof = read_json(
-        path,
-        {
-            "user_id": user_id,
-            "premium": False,
-            "premium_preview_until": None,
-            "premium_unlocked_by_reward": False,
-            "theme": NEUTRAL_THEME,
-            "badges": [],
-            "nickname": None,
-            "status_text": None,
-            "emoji_flair": None,
-            "accent_color": None,
-            "quote": None,
-            "frame": None,
-            "banner_file": None,
-        },
-    )
-    return prof
+    return read_json(profile_path(user_id), default_profile(user_id))
+
+
+def update_profile(user_id: int, fn) -> Dict[str, Any]:
+    """Read-modify-write a profile under the store's lock so concurrent clusters don't lose updates.
+    `fn` gets the current profile, may change it in place, and returns the profile to save."""
+    return update_json(profile_path(user_id), default_profile(user_id), fn)
 
 
-def save_profile(user_id: int, prof: Dict[str, Any]) -> None:
-    write_json(profile_path(user_id), prof)
+def set_profile_fields(user_id: int, **fields: Any) -> Dict[str, Any]:
+    return update_profile(user_id, lambda prof: {**prof, **fields})
+
+
+def flip_theme(prof: Dict[str, Any]) -> Dict[str, Any]:
+    prof["theme"] = ANIME_THEME if (prof.get("theme") != ANIME_THEME) else NEUTRAL_THEME
+    return prof
 
 
 def is_owner(user_id: int) -> bool:
@@ -242,6 +952,23 @@ def is_admin(user_id: int) -> bool:
     return user_id in set(data.get("admins") or [])
 
 
+def set_admin(user_id: int, admin: bool) -> None:
+    def apply(cfg: Dict[str, Any]) -> Dict[str, Any]:
+        admins = set(cfg.get("admins") or [])
+        if admin:
+            admins.add(user_id)
+        else:
+            admins.discard(user_id)
+        return {"admins": list(admins)}
+
+    update_json(ADMIN_FILE, {"admins": []}, apply)
+
+
+def apply_owner_override(user_id: int) -> None:
+    until = datetime.now(timezone.utc) + timedelta(days=3650)
+    set_profile_fields(user_id, premium=True, premium_unlocked_by_reward=True, premium_preview_until=until.isoformat())
+
+
 def has_premium(user_id: int) -> bool:
     prof = load_profile(user_id)
     if prof.get("premium"):
@@ -261,12 +988,240 @@ def has_premium(user_id: int) -> bool:
     return False
 
 
+# KANZI_MEMBER_CACHE=lean caches only members in voice, skips chunking and the message cache;
+# KANZI_SLASH_ONLY drops the message_content intent and prefix-command parsing.
+MEMBER_CACHE_PROFILE = os.getenv("KANZI_MEMBER_CACHE", "full").lower()
+SLASH_ONLY = os.getenv("KANZI_SLASH_ONLY", "").lower() in ("1", "true", "yes")
+
 intents = nextcord.Intents.default()
-intents.message_content = True
+intents.message_content = not SLASH_ONLY
 intents.members = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+bot_options: Dict[str, Any] = {"command_prefix": "!", "intents": intents, "help_command": None}
+if MEMBER_CACHE_PROFILE == "lean":
+    member_cache_flags = nextcord.MemberCacheFlags.none()
+    member_cache_flags.voice = True
+    bot_options.update(member_cache_flags=member_cache_flags, chunk_guilds_at_startup=False, max_messages=None)
+
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(**bot_options, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(**bot_options)
+
+
+if SLASH_ONLY:
+    @bot.event
+    async def on_message(message: nextcord.Message):
+        # Replaces Bot.on_message so prefix commands are never parsed.
+        return
+
+
+MEMBER_NAME_TTL = 600
+MEMBER_NAME_CACHE_MAX = 10000
+member_names: Dict[tuple, tuple] = {}
+
+
+async def resolve_member_names(guild: nextcord.Guild, user_ids: List[int]) -> Dict[int, str]:
+    """Display names from the member cache, then a short TTL cache, then one batched gateway query.
+    Users who are not in the guild are cached as misses too and left out of the result."""
+    now = time.monotonic()
+    names: Dict[int, str] = {}
+    missing = []
+    for uid in user_ids:
+        member = guild.get_member(uid)
+        cached = member_names.get((guild.id, uid))
+        if member:
+            names[uid] = member.display_name
+        elif cached and cached[1] > now:
+            if cached[0] is not None:
+                names[uid] = cached[0]
+        else:
+            missing.append(uid)
+    if not missing:
+        return names
+    try:
+        with span("discord.query_members", count=len(missing)):
+            fetched = await guild.query_members(user_ids=missing[:100], limit=100, cache=False)
+    except Exception as e:
+        logger.warning("Member name lookup failed", guild=guild.id, error=str(e))
+        return names
+    if len(member_names) > MEMBER_NAME_CACHE_MAX:
+        for key in [k for k, (_, expires) in member_names.items() if expires <= now]:
+            del member_names[key]
+    for member in fetched:
+        names[member.id] = member.display_name
+        member_names[(guild.id, member.id)] = (member.display_name, now + MEMBER_NAME_TTL)
+    for uid in missing[:100]:
+        if uid not in names:
+            member_names[(guild.id, uid)] = (None, now + MEMBER_NAME_TTL)
+    return names
+
+
+@bot.before_invoke
+async def begin_prefix_trace(ctx: commands.Context):
+    start_trace(f"!{ctx.command.qualified_name}", guild=str(ctx.guild.id if ctx.guild else None), user=str(ctx.author.id))
+
+
+@bot.after_invoke
+async def record_prefix_command(ctx: commands.Context):
+    outcome = "error" if ctx.command_failed else "ok"
+    record_command("prefix", ctx.command.qualified_name, ctx.message.created_at, outcome)
+    trace = current_trace.get()
+    if trace is not None:
+        end_trace(trace, ctx.command_failed)
+
+
+@bot.event
+async def on_interaction(interaction: nextcord.Interaction):
+    if interaction.type != nextcord.InteractionType.application_command:
+        await bot.process_application_commands(interaction)
+        return
+    with trace_interaction(f"/{interaction_command_name(interaction)}", guild=str(interaction.guild_id), user=str(interaction.user.id)):
+        await bot.process_application_commands(interaction)
+
+
+def _trace_discord_requests() -> None:
+    """Record a span for every Discord REST call, including interaction webhooks."""
+
+    def wrap(original):
+        async def request(self, route, *args, **kwargs):
+            with span(f"discord {route.method} {getattr(route, 'path', '')}"):
+                return await original(self, route, *args, **kwargs)
+        return request
+
+    targets = [nextcord.http.HTTPClient]
+    try:
+        from nextcord.webhook.async_ import AsyncWebhookAdapter
+        targets.append(AsyncWebhookAdapter)
+    except ImportError:
+        pass
+    for cls in targets:
+        cls.request = wrap(cls.request)
+
+
+_trace_discord_requests()
+
+
+@bot.listen("on_command_error")
+async def record_prefix_command_error(ctx: commands.Context, error: commands.CommandError):
+    if ctx.command is None:
+        return
+    if isinstance(error, commands.CommandInvokeError):
+        logger.error("Command failed", command=ctx.command.qualified_name, error=str(error.original), exc_info=error.original)
+        return
+    # Registering this listener turns off nextcord's default error printing, so log the rest too
+    logger.warning("Command rejected", command=ctx.command.qualified_name, reason=type(error).__name__, error=str(error))
+    record_command("prefix", ctx.command.qualified_name, ctx.message.created_at, "rejected")
+
+
+@bot.listen("on_application_command_completion")
+async def record_slash_command(interaction: nextcord.Interaction):
+    record_command("slash", interaction_command_name(interaction), interaction.created_at, "ok")
+
+
+@bot.listen("on_application_command_error")
+async def record_slash_command_error(interaction: nextcord.Interaction, error: Exception):
+    name = interaction_command_name(interaction)
+    logger.error("Slash command failed", command=name, error=str(error), exc_info=error)
+    record_command("slash", name, interaction.created_at, "error")
+
+
+async def monitor_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        EVENT_LOOP_LAG.set(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+
+
+loop_lag_task: Optional[asyncio.Task] = None
+
+
+LOOP_WATCHDOG_ENABLED = os.getenv("KANZI_LOOP_WATCHDOG", "").lower() in ("1", "true", "yes")
+LOOP_WATCHDOG_THRESHOLD = float(os.getenv("KANZI_LOOP_WATCHDOG_MS", "250")) / 1000
+LOOP_BLOCK_DURATION = Histogram(
+    'event_loop_block_seconds',
+    'Event loop stalls caught by the watchdog, by blocking call site',
+    ['site'],
+    buckets=(0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+
+
+def command_callback_names() -> Dict[Any, str]:
+    """Map command handler code objects to command names so a stack can be attributed to a command."""
+    names = {}
+    for cmd in bot.walk_commands():
+        names[cmd.callback.__code__] = f"!{cmd.qualified_name}"
+    for app_cmd in bot.get_all_application_commands():
+        callback = getattr(app_cmd, "callback", None)
+        if callback is not None:
+            names[callback.__code__] = f"/{app_cmd.name}"
+    return names
+
+
+def describe_blocking_frame(frame, command_names: Dict[Any, str]) -> tuple:
+    """Return (command, site) for a stalled loop thread stack.
+
+    The site is the innermost frame in this file, i.e. the line of bot code that made the blocking call.
+    """
+    command = None
+    site = None
+    while frame is not None:
+        code = frame.f_code
+        if site is None and code.co_filename == __file__:
+            site = f"{code.co_name}:{frame.f_lineno}"
+        if code in command_names or code in COMPONENT_CODE_NAMES:
+            command = command_names.get(code) or COMPONENT_CODE_NAMES[code]
+        frame = frame.f_back
+    return command or "unknown", site or "external"
+
+
+class LoopWatchdog(threading.Thread):
+    """Pings the event loop from a helper thread and captures the loop thread's stack when it stalls."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int, threshold: float, command_names: Dict[Any, str]):
+        super().__init__(name="kanzi-loop-watchdog", daemon=True)
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.threshold = threshold
+        self.command_names = command_names
+
+    def run(self) -> None:
+        while not self.loop.is_closed():
+            answered = threading.Event()
+            sent = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return
+            if answered.wait(self.threshold):
+                time.sleep(self.threshold)
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            command, site = describe_blocking_frame(frame, self.command_names)
+            del frame
+            while not answered.wait(1.0):
+                if self.loop.is_closed():
+                    return
+            blocked = time.monotonic() - sent
+            LOOP_BLOCK_DURATION.labels(site=site).observe(blocked)
+            logger.warning("Event loop blocked", seconds=round(blocked, 3), command=command, site=site, stack=stack)
+
+
+loop_watchdog: Optional[LoopWatchdog] = None
+
+
+def start_loop_watchdog() -> None:
+    global loop_watchdog
+    if not LOOP_WATCHDOG_ENABLED or loop_watchdog is not None:
+        return
+    loop_watchdog = LoopWatchdog(asyncio.get_running_loop(), threading.get_ident(), LOOP_WATCHDOG_THRESHOLD, command_callback_names())
+    loop_watchdog.start()
+    logger.info("Event loop watchdog started", threshold_ms=int(LOOP_WATCHDOG_THRESHOLD * 1000))
+
+
 
 def load_env():
     env_path = os.path.join(PROJECT_ROOT, ".env")
@@ -289,33 +1244,182 @@ def load_env():
             except Exception:
                 pass
 
-    # Initialize API clients
+
+def spotify_configured() -> bool:
+    return bool(os.getenv("SPOTIFY_CLIENT_ID") and os.getenv("SPOTIFY_CLIENT_SECRET"))
+
+
+def openai_configured() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def get_spotify_client():
+    """Import spotipy and build the client the first time it is needed"""
     global spotify_client
-    spotify_id = os.getenv("SPOTIFY_CLIENT_ID")
-    spotify_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-    if spotify_id and spotify_secret:
-        spotify_client = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=spotify_id, client_secret=spotify_secret))
+    if spotify_client is None and spotify_configured():
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+        spotify_client = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+            client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+            client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+        ))
+    return spotify_client
+
+
+def get_openai():
+    """Import and configure the openai module the first time it is needed"""
+    global _openai_module
+    if _openai_module is None:
+        import openai
+        openai.api_key = os.getenv('OPENAI_API_KEY')
+        _openai_module = openai
+    return _openai_module
+
+
+async def warm_up_integrations() -> None:
+    """Load configured integrations off the event loop so first use does not pay the import"""
+    loaders = {"yt_dlp": lambda: __import__("yt_dlp"), "psutil": lambda: __import__("psutil")}
+    if spotify_configured():
+        loaders["spotify"] = get_spotify_client
+    if openai_configured():
+        loaders["openai"] = get_openai
+    for name, loader in loaders.items():
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(loader)
+        except Exception as e:
+            logger.warning("Integration warm-up failed", integration=name, error=str(e))
+            continue
+        STARTUP_TIMINGS[f"warmup_{name}"] = time.perf_counter() - started
+        STARTUP_PHASE.labels(phase=f"warmup_{name}").set(STARTUP_TIMINGS[f"warmup_{name}"])
+    logger.info("Integrations warmed up", **{k: round(v, 3) for k, v in STARTUP_TIMINGS.items() if k.startswith("warmup_")})
 
-    openai.api_key = os.getenv('OPENAI_API_KEY')
+COMMAND_SYNC_FILE = os.path.join(DATA_ROOT, "command_sync.json")
+COMMAND_SYNC_CONCURRENCY = int(os.getenv("KANZI_SYNC_CONCURRENCY", "5"))
+METRICS_PORT = 8000
 
-@bot.event
-async def on_ready():
-    ensure_dirs()
-    start_listening_tracker.start()
-    
-    # Start metrics server
-    start_http_server(8000)
-    
-    try:
+_run_started = time.perf_counter()
+warmup_task: Optional[asyncio.Task] = None
+
+startup_lock = asyncio.Lock()
+startup_complete = False
+metrics_server_started = False
+
+
+def command_schema_hash(guild_id: Optional[int]) -> str:
+    """Hash the payloads Discord would receive for the global (None) or one guild's command set."""
+    payloads = []
+    for cmd in bot.get_all_application_commands():
+        if guild_id is None:
+            if not cmd.is_global:
+                continue
+        elif guild_id not in cmd.guild_ids:
+            continue
+        payloads.append(cmd.get_payload(guild_id))
+    payloads.sort(key=lambda p: (p.get("type", 1), p.get("name", "")))
+    return hashlib.sha256(json.dumps(payloads, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def sync_commands_if_changed() -> Dict[str, int]:
+    """Sync application commands only where the schema changed since the last successful sync."""
+    state = read_json(COMMAND_SYNC_FILE, {"global": None, "guilds": {}})
+    guild_hashes = state.get("guilds") or {}
+    changed: Dict[str, str] = {}
+    synced = {"global": 0, "guilds": 0, "skipped": 0, "failed": 0}
+
+    # Global commands are owned by the cluster running shard 0; the others only sync their guilds.
+    global_hash = command_schema_hash(None)
+    if (SHARD_IDS is None or 0 in SHARD_IDS) and state.get("global") != global_hash:
         await bot.sync_application_commands()
-        for guild in bot.guilds:
+        synced["global"] = 1
+
+    sem = asyncio.Semaphore(COMMAND_SYNC_CONCURRENCY)
+
+    async def sync_guild(guild: nextcord.Guild) -> None:
+        schema = command_schema_hash(guild.id)
+        if guild_hashes.get(str(guild.id)) == schema:
+            synced["skipped"] += 1
+            return
+        async with sem:
             try:
                 await guild.sync_application_commands()
-            except Exception:
-                pass
-        print("Slash commands synced.")
+            except Exception as e:
+                synced["failed"] += 1
+                logger.warning("Guild command sync failed", guild=guild.id, error=str(e))
+                return
+        changed[str(guild.id)] = schema
+        synced["guilds"] += 1
+
+    await asyncio.gather(*(sync_guild(g) for g in bot.guilds))
+
+    def merge(current: Dict[str, Any]) -> Dict[str, Any]:
+        current.setdefault("guilds", {}).update(changed)
+        if synced["global"]:
+            current["global"] = global_hash
+        return current
+
+    if changed or synced["global"]:
+        update_json(COMMAND_SYNC_FILE, {"global": None, "guilds": {}}, merge)
+    return synced
+
+
+async def run_startup() -> None:
+    """One-time initialisation; on_ready fires again on every reconnect. Every step is safe to
+    repeat, so a startup that failed partway is simply retried on the next on_ready."""
+    global loop_lag_task, warmup_task, restore_task, metrics_server_started
+    STARTUP_TIMINGS["gateway_ready"] = time.perf_counter() - _run_started
+    STARTUP_PHASE.labels(phase="gateway_ready").set(STARTUP_TIMINGS["gateway_ready"])
+    if not CLUSTER_ID and not metrics_server_started:
+        # Cluster processes write to PROMETHEUS_MULTIPROC_DIR; launch() serves the aggregate.
+        metrics_server_started = True
+        try:
+            start_http_server(METRICS_PORT)
+        except OSError as e:
+            logger.error("Metrics server failed to start", port=METRICS_PORT, error=str(e))
+    for loop_task in (start_listening_tracker, sample_ffmpeg_usage, sample_gateway_memory):
+        if not loop_task.is_running():
+            loop_task.start()
+    bot.add_view(MusicControls.shared())
+    bot.add_view(KanziView.shared())
+    warm_embed_templates()
+    asyncio.create_task(playlist_index.refresh())
+    if loop_lag_task is None or loop_lag_task.done():
+        loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    start_loop_watchdog()
+
+    try:
+        with startup_phase("command_sync"):
+            synced = await sync_commands_if_changed()
+        print(f"Slash commands synced in {STARTUP_TIMINGS['command_sync']:.1f}s: {synced}")
     except Exception as e:
         print(f"Slash sync failed: {e}")
+    logger.info("Startup timings", **{k: round(v, 3) for k, v in STARTUP_TIMINGS.items()})
+    if restore_task is None:
+        restore_task = asyncio.create_task(restore_playback())
+    if warmup_task is None:
+        warmup_task = asyncio.create_task(warm_up_integrations())
+
+
+@bot.event
+async def on_connect():
+    # nextcord's default handler re-syncs global commands on every (re)connect;
+    # run_startup syncs once, and only when the command schema changed.
+    bot.add_all_application_commands()
+
+
+@bot.event
+async def on_ready():
+    global startup_complete
+    async with startup_lock:
+        if startup_complete:
+            logger.info("Gateway resumed", guilds=len(bot.guilds))
+            return
+        try:
+            await run_startup()
+        except Exception as e:
+            logger.error("Startup failed; retrying on the next ready event", error=str(e), exc_info=e)
+            return
+        startup_complete = True
     print(f"Kanzi Bot is online as {bot.user}")
 
 
@@ -330,11 +1434,16 @@ async def on_ready():
 
 
 def grant_free_preview_if_needed(user_id: int) -> None:
-    prof = load_profile(user_id)
-    if not prof.get("premium_preview_until"):
-        until = datetime.now(timezone.utc) + timedelta(days=PREMIUM_PREVIEW_DAYS)
-        prof["premium_preview_until"] = until.isoformat()
-        save_profile(user_id, prof)
+    if load_profile(user_id).get("premium_preview_until"):
+        return
+
+    def grant(prof: Dict[str, Any]) -> Dict[str, Any]:
+        if not prof.get("premium_preview_until"):
+            until = datetime.now(timezone.utc) + timedelta(days=PREMIUM_PREVIEW_DAYS)
+            prof["premium_preview_until"] = until.isoformat()
+        return prof
+
+    update_profile(user_id, grant)
 
 
 def listening_stats() -> Dict[str, Any]:
@@ -342,17 +1451,205 @@ def listening_stats() -> Dict[str, Any]:
 
 
 def update_listening(user_id: int, seconds: int) -> None:
-    stats = listening_stats()
-    u = str(user_id)
-    cur = int(stats.get(u, 0))
-    cur += max(0, seconds)
-    stats[u] = cur
-    write_json(LISTENING_FILE, stats)
-    if cur >= REWARD_LISTEN_SECONDS_REQUIRED:
-        prof = load_profile(user_id)
-        if not prof.get("premium_unlocked_by_reward"):
-            prof["premium_unlocked_by_reward"] = True
-            save_profile(user_id, prof)
+    update_listening_many({user_id: seconds})
+
+
+def update_listening_many(credits: Dict[int, int]) -> None:
+    """Add listening seconds for several users in one store write"""
+    credits = {str(uid): sec for uid, sec in credits.items() if sec > 0}
+    if not credits:
+        return
+
+    def add(stats: Dict[str, Any]) -> Dict[str, Any]:
+        for u, sec in credits.items():
+            stats[u] = int(stats.get(u, 0)) + sec
+        return stats
+
+    stats = update_json(LISTENING_FILE, {}, add)
+    for u in credits:
+        if stats[u] >= REWARD_LISTEN_SECONDS_REQUIRED:
+            if not load_profile(int(u)).get("premium_unlocked_by_reward"):
+                set_profile_fields(int(u), premium_unlocked_by_reward=True)
+
+
+# Listening history: per guild, one row per user with a ring of daily buckets and a ring of
+# monthly buckets in memory-mapped .npy files. Daily buckets expire after HISTORY_DAYS; the
+# monthly buckets are filled alongside them and keep HISTORY_MONTHS of downsampled history.
+HISTORY_DIR = os.path.join(MUSIC_DIR, "history")
+HISTORY_DAYS = int(os.getenv("KANZI_HISTORY_DAYS", "92"))
+HISTORY_MONTHS = int(os.getenv("KANZI_HISTORY_MONTHS", "24"))
+HISTORY_OPEN_GUILDS = 512
+HISTORY_INITIAL_ROWS = 64
+LEADERBOARD_PERIODS = ("all", "day", "week", "month")
+LEADERBOARD_TITLES = {"all": "Top Listeners", "day": "Top Listeners Today", "week": "Top Listeners This Week", "month": "Top Listeners This Month"}
+
+
+def epoch_day(ts: Optional[float] = None) -> int:
+    return int((time.time() if ts is None else ts) // 86400)
+
+
+def epoch_month(day: int) -> int:
+    d = datetime.fromtimestamp(day * 86400, timezone.utc)
+    return d.year * 12 + d.month - 1
+
+
+class GuildHistory:
+    def __init__(self, np, path: str):
+        self.np = np
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # users.npy is resized last, so the bucket files always have at least len(users) rows
+        self.users = self._open("users.npy", np.int64, (HISTORY_INITIAL_ROWS,))
+        self.daily = self._open("daily.npy", np.uint32, (len(self.users), HISTORY_DAYS))
+        self.days = self._open("days.npy", np.int32, (self.daily.shape[1],), fill=-1)
+        self.monthly = self._open("monthly.npy", np.uint32, (len(self.users), HISTORY_MONTHS))
+        self.months = self._open("months.npy", np.int32, (self.monthly.shape[1],), fill=-1)
+        self.rows = int(np.count_nonzero(self.users))
+        self.index = {int(u): i for i, u in enumerate(self.users[:self.rows])}
+
+    def _open(self, name: str, dtype, shape: tuple, fill: int = 0):
+        file = os.path.join(self.path, name)
+        if os.path.exists(file):
+            return self.np.load(file, mmap_mode="r+")
+        arr = self.np.lib.format.open_memmap(file, mode="w+", dtype=dtype, shape=shape)
+        arr[:] = fill
+        return arr
+
+    def _resize(self, name: str, arr, rows: int):
+        file = os.path.join(self.path, name)
+        tmp = file + ".tmp"
+        new = self.np.lib.format.open_memmap(tmp, mode="w+", dtype=arr.dtype, shape=(rows,) + arr.shape[1:])
+        new[:arr.shape[0]] = arr
+        new[arr.shape[0]:] = 0
+        new.flush()
+        os.replace(tmp, file)
+        return new
+
+    def _grow(self) -> None:
+        rows = len(self.users) * 2
+        self.daily = self._resize("daily.npy", self.daily, rows)
+        self.monthly = self._resize("monthly.npy", self.monthly, rows)
+        self.users = self._resize("users.npy", self.users, rows)
+
+    @staticmethod
+    def _column(buckets, labels, key: int) -> int:
+        col = key % len(labels)
+        if labels[col] != key:
+            # The slot still holds an expired day/month; recycle it
+            buckets[:, col] = 0
+            labels[col] = key
+        return col
+
+    def add(self, credits: Dict[int, int], day: int) -> None:
+        dcol = self._column(self.daily, self.days, day)
+        mcol = self._column(self.monthly, self.months, epoch_month(day))
+        for uid, sec in credits.items():
+            row = self.index.get(uid)
+            if row is None:
+                if self.rows == len(self.users):
+                    self._grow()
+                row = self.rows
+                self.users[row] = uid
+                self.index[uid] = row
+                self.rows += 1
+            self.daily[row, dcol] += sec
+            self.monthly[row, mcol] += sec
+
+    def top(self, period: str, limit: int, today: int) -> List[tuple]:
+        np = self.np
+        n = self.rows
+        if not n:
+            return []
+        if period == "month":
+            buckets, mask = self.monthly, self.months == epoch_month(today)
+        else:
+            # Epoch day 0 was a Thursday, so (day + 3) % 7 is the weekday with Monday = 0
+            first = today if period == "day" else today - (today + 3) % 7
+            buckets, mask = self.daily, (self.days >= first) & (self.days <= today)
+        totals = buckets[:n][:, mask].sum(axis=1, dtype=np.int64)
+        k = min(limit, n)
+        best = np.argpartition(totals, n - k)[n - k:]
+        best = best[np.argsort(totals[best])[::-1]]
+        return [(int(self.users[i]), int(totals[i])) for i in best if totals[i] > 0]
+
+    def flush(self) -> None:
+        for arr in (self.users, self.daily, self.days, self.monthly, self.months):
+            arr.flush()
+
+
+class ListeningHistory:
+    """Keeps up to HISTORY_OPEN_GUILDS guild histories mapped, least recently used first out.
+    Checkpoints write from a worker thread while leaderboards read on the loop, hence the lock."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._np = None
+        self._guilds: "collections.OrderedDict[int, GuildHistory]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def guild(self, guild_id: int, create: bool = True) -> Optional[GuildHistory]:
+        history = self._guilds.get(guild_id)
+        if history is not None:
+            self._guilds.move_to_end(guild_id)
+            return history
+        path = os.path.join(self.root, str(guild_id))
+        if not create and not os.path.exists(path):
+            return None
+        if self._np is None:
+            import numpy
+            self._np = numpy
+        history = self._guilds[guild_id] = GuildHistory(self._np, path)
+        if len(self._guilds) > HISTORY_OPEN_GUILDS:
+            _, evicted = self._guilds.popitem(last=False)
+            evicted.flush()
+        return history
+
+    def record(self, guild_id: int, credits: Dict[int, int]) -> None:
+        with span("history.record", guild=str(guild_id), users=len(credits)), self._lock:
+            self.guild(guild_id).add(credits, epoch_day())
+
+    def top(self, guild_id: int, period: str, limit: int = 10) -> List[tuple]:
+        with span("history.top", guild=str(guild_id), period=period), self._lock:
+            history = self.guild(guild_id, create=False)
+            return history.top(period, limit, epoch_day()) if history else []
+
+    def flush(self) -> None:
+        with self._lock:
+            for history in list(self._guilds.values()):
+                history.flush()
+
+
+listening_history = ListeningHistory(HISTORY_DIR)
+
+
+def record_listening(guild_credits: Dict[int, Dict[int, int]]) -> None:
+    """Credit listening seconds per guild to the history and to lifetime totals in one store write"""
+    totals: Dict[int, int] = {}
+    for guild_id, credits in guild_credits.items():
+        credits = {uid: sec for uid, sec in credits.items() if sec > 0}
+        if not credits:
+            continue
+        try:
+            listening_history.record(guild_id, credits)
+        except Exception as e:
+            logger.warning("Listening history update failed", guild=guild_id, error=str(e))
+        for uid, sec in credits.items():
+            totals[uid] = totals.get(uid, 0) + sec
+    update_listening_many(totals)
+
+
+def checkpoint_listening(guild_credits: Dict[int, Dict[int, int]]) -> None:
+    """Blocking part of a checkpoint: memmap opens/grows, the totals write and the flush. Run it in a thread."""
+    record_listening(guild_credits)
+    listening_history.flush()
+
+
+def top_listeners(guild: Optional[nextcord.Guild], period: str, limit: int = 10) -> List[tuple]:
+    if period != "all" and guild is not None:
+        return listening_history.top(guild.id, period, limit)
+    items = [(int(uid), int(sec)) for uid, sec in listening_stats().items()]
+    items.sort(key=lambda x: x[1], reverse=True)
+    return items[:limit]
 
 
 def human_time(seconds: int) -> str:
@@ -391,18 +1688,482 @@ def make_embed(title: str, description: Optional[str], user: Optional[nextcord.a
     embed.timestamp = datetime.now(timezone.utc)
     return embed
 
+
+TEMPLATE_RENDER = Histogram('embed_template_render_seconds', 'Time to build an embed template on a cache miss', ['template'])
+TEMPLATE_REQUESTS = Counter('embed_template_requests_total', 'Embed template lookups', ['template', 'result'])
+TEMPLATE_CACHE_MAX = 1024
+
+ANIME_RECS = {
+    ANIME_THEME: [
+        "Fullmetal Alchemist: Brotherhood",
+        "Attack on Titan",
+        "Cyberpunk: Edgerunners",
+        "Your Name",
+        "Jujutsu Kaisen",
+    ],
+    NEUTRAL_THEME: [
+        "Violet Evergarden",
+        "Mushishi",
+        "Barakamon",
+        "A Silent Voice",
+        "Made in Abyss",
+    ],
+}
+
+
+class EmbedTemplates:
+    """Builds each (template, key) embed once per version and hands out copies"""
+
+    def __init__(self, max_entries: int = TEMPLATE_CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[tuple, tuple]" = collections.OrderedDict()
+
+    def _lookup(self, template: str, key: Any, version: Any) -> tuple:
+        entry = self._entries.get((template, key))
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end((template, key))
+            TEMPLATE_REQUESTS.labels(template=template, result="hit").inc()
+            return True, entry[1]
+        TEMPLATE_REQUESTS.labels(template=template, result="miss").inc()
+        return False, None
+
+    def _store(self, template: str, key: Any, version: Any, embed: Optional[nextcord.Embed]) -> None:
+        self._entries[(template, key)] = (version, embed)
+        self._entries.move_to_end((template, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, template: str, key: Any, version: Any, build) -> Optional[nextcord.Embed]:
+        found, embed = self._lookup(template, key, version)
+        if not found:
+            with TEMPLATE_RENDER.labels(template=template).time():
+                embed = build()
+            self._store(template, key, version, embed)
+        return embed.copy() if embed is not None else None
+
+    async def aget(self, template: str, key: Any, version: Any, build) -> Optional[nextcord.Embed]:
+        found, embed = self._lookup(template, key, version)
+        if not found:
+            with TEMPLATE_RENDER.labels(template=template).time():
+                embed = await build()
+            self._store(template, key, version, embed)
+        return embed.copy() if embed is not None else None
+
+
+embed_templates = EmbedTemplates()
+
+
+def anime_recs_embed(theme: str) -> nextcord.Embed:
+    theme = theme if theme in ANIME_RECS else NEUTRAL_THEME
+    return embed_templates.get(
+        "anime_recs", theme, 0,
+        lambda: nextcord.Embed(title="Anime Recommendations", description="\n".join(f"• {r}" for r in ANIME_RECS[theme]), color=0xE91E63),
+    )
+
+
+def playlist_page_embed() -> Optional[nextcord.Embed]:
+    """First page of the community playlist, or None when it is empty"""
+    def build() -> Optional[nextcord.Embed]:
+        data = read_json(PLAYLIST_FILE, [])
+        if not data:
+            return None
+        lines = [f"{i}. {item.get('title') or item.get('link')}" for i, item in enumerate(data[:10], start=1)]
+        return nextcord.Embed(title="Community Playlist", description="\n".join(lines), color=0x03A9F4)
+    return embed_templates.get("playlist_page", None, document_version(PLAYLIST_FILE), build)
+
+
+# Listening sessions: guild_id -> {user_id: monotonic time credited up to}. A session is open
+# while the bot is playing (not paused) and the user sits undeafened in the bot's channel.
+listening_sessions: Dict[int, Dict[int, float]] = {}
+# Seconds from sessions closed by voice events, held in memory until the next checkpoint persists them
+closed_credits: Dict[int, Dict[int, int]] = {}
+LISTENING_SESSIONS_OPEN = Gauge('listening_sessions_open', 'Listening sessions currently open')
+
+
+def is_listening(member: nextcord.Member, channel: Optional[nextcord.abc.GuildChannel]) -> bool:
+    voice = member.voice
+    return (
+        not member.bot
+        and channel is not None
+        and voice is not None
+        and voice.channel == channel
+        and not (voice.self_deaf or voice.deaf)
+    )
+
+
+def active_voice_channel(guild: nextcord.Guild) -> Optional[nextcord.VoiceChannel]:
+    vc: Optional[nextcord.VoiceClient] = guild.voice_client
+    if vc and vc.is_connected() and vc.is_playing():
+        return vc.channel
+    return None
+
+
+def close_sessions(guild_id: int, user_ids: List[int], now: float) -> Dict[int, int]:
+    sessions = listening_sessions.get(guild_id, {})
+    credits = {uid: int(round(now - sessions.pop(uid))) for uid in user_ids if uid in sessions}
+    if not sessions:
+        listening_sessions.pop(guild_id, None)
+    return credits
+
+
+def bank_credits(guild_id: int, credits: Dict[int, int]) -> None:
+    if not credits:
+        return
+    banked = closed_credits.setdefault(guild_id, {})
+    for uid, sec in credits.items():
+        banked[uid] = banked.get(uid, 0) + sec
+
+
+def take_closed_credits() -> Dict[int, Dict[int, int]]:
+    taken = {gid: dict(credits) for gid, credits in closed_credits.items()}
+    closed_credits.clear()
+    return taken
+
+
+def refresh_listening_sessions(guild: nextcord.Guild) -> None:
+    """Reconcile a guild's sessions after a playback or bot channel transition"""
+    now = time.monotonic()
+    channel = active_voice_channel(guild)
+    listeners = {m.id for m in channel.members if is_listening(m, channel)} if channel else set()
+    sessions = listening_sessions.get(guild.id, {})
+    credits = close_sessions(guild.id, [uid for uid in sessions if uid not in listeners], now)
+    if listeners:
+        sessions = listening_sessions.setdefault(guild.id, {})
+        for uid in listeners:
+            sessions.setdefault(uid, now)
+    LISTENING_SESSIONS_OPEN.set(sum(len(s) for s in listening_sessions.values()))
+    bank_credits(guild.id, credits)
+
+
+@bot.listen("on_voice_state_update")
+async def track_listening_session(member: nextcord.Member, before: nextcord.VoiceState, after: nextcord.VoiceState):
+    guild = member.guild
+    if bot.user and member.id == bot.user.id:
+        refresh_listening_sessions(guild)
+        return
+    if member.bot:
+        return
+    channel = active_voice_channel(guild)
+    now = time.monotonic()
+    if is_listening(member, channel):
+        listening_sessions.setdefault(guild.id, {}).setdefault(member.id, now)
+        credits = {}
+    else:
+        credits = close_sessions(guild.id, [member.id], now)
+    LISTENING_SESSIONS_OPEN.set(sum(len(s) for s in listening_sessions.values()))
+    bank_credits(guild.id, credits)
+
+
 @tasks.loop(seconds=60)
 async def start_listening_tracker():
-    for guild in bot.guilds:
-        vc: Optional[nextcord.VoiceClient] = guild.voice_client
-        if vc and vc.is_connected() and (vc.is_playing() or vc.is_paused()):
-            channel: Optional[nextcord.VoiceChannel] = vc.channel
-            if not channel:
-                continue
-            for member in channel.members:
-                if member.bot:
-                    continue
-                update_listening(member.id, 60)
+    """Checkpoint open sessions so a crash loses at most one interval of listening time"""
+    now = time.monotonic()
+    guild_credits = take_closed_credits()
+    for guild_id, sessions in listening_sessions.items():
+        credits = guild_credits.setdefault(guild_id, {})
+        for uid, since in sessions.items():
+            whole = int(now - since)
+            if whole:
+                credits[uid] = credits.get(uid, 0) + whole
+                sessions[uid] = since + whole
+    await asyncio.to_thread(checkpoint_listening, guild_credits)
+
+
+# Banners: downloaded once, normalized to BANNER_SIZE JPEG off the event loop, uploaded on the
+# next profile view and from then on referenced by the Discord CDN URL of that upload.
+BANNER_SIZE = (960, 320)
+BANNER_MAX_DOWNLOAD = 8 * 1024 * 1024
+BANNER_MAX_PIXELS = 40_000_000
+BANNER_URL_MARGIN = 3600
+BANNER_UPLOADS = Counter('banner_uploads_total', 'Profile renders by how the banner was attached', ['mode'])
+
+
+class BannerError(Exception):
+    """Rejected banner; the message is shown to the user"""
+
+
+async def download_banner(link: str) -> bytes:
+    if not link.lower().startswith(("http://", "https://")):
+        raise BannerError("Invalid link. Use http/https URLs only.")
+    with span("http banner"):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(link, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                if resp.status != 200:
+                    raise BannerError("Failed to download banner.")
+                if (resp.content_length or 0) > BANNER_MAX_DOWNLOAD:
+                    raise BannerError("Banner image is too large (max 8 MB).")
+                # content.read(n) returns only what is buffered, so collect chunks until EOF
+                chunks: List[bytes] = []
+                size = 0
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > BANNER_MAX_DOWNLOAD:
+                        raise BannerError("Banner image is too large (max 8 MB).")
+                    chunks.append(chunk)
+    if not size:
+        raise BannerError("Failed to download banner.")
+    return b"".join(chunks)
+
+
+def normalize_banner(data: bytes) -> bytes:
+    """Validate an image and re-encode it as a BANNER_SIZE JPEG (CPU bound, run in a thread)"""
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if img.width * img.height > BANNER_MAX_PIXELS:
+                raise BannerError("Banner image has too many pixels.")
+            img.draft("RGB", BANNER_SIZE)
+            banner = ImageOps.fit(ImageOps.exif_transpose(img).convert("RGB"), BANNER_SIZE, Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError, ValueError):
+        raise BannerError("That link is not a supported image.")
+    out = io.BytesIO()
+    banner.save(out, format="JPEG", quality=85, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def write_banner_file(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+async def set_banner(user_id: int, link: str) -> None:
+    data = await download_banner(link)
+    with span("banner.normalize"):
+        banner = await asyncio.to_thread(normalize_banner, data)
+    fpath = os.path.join(BANNERS_DIR, f"{user_id}_banner.jpg")
+    await asyncio.to_thread(write_banner_file, fpath, banner)
+    old = None
+
+    def attach(prof: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal old
+        old = prof.get("banner_file")
+        prof["banner_file"] = fpath
+        prof["banner_url"] = None  # the cached CDN URL points at the previous image
+        return prof
+
+    update_profile(user_id, attach)
+    if old and old != fpath and os.path.exists(old):
+        os.remove(old)
+
+
+def cdn_url_expiry(url: str) -> Optional[float]:
+    """Expiry of a signed Discord CDN URL (hex unix time in the ex= query parameter)"""
+    from urllib.parse import urlparse, parse_qs
+    ex = parse_qs(urlparse(url).query).get("ex")
+    try:
+        return int(ex[0], 16) if ex else None
+    except ValueError:
+        return None
+
+
+def banner_cdn_url(prof: Dict[str, Any]) -> Optional[str]:
+    url = prof.get("banner_url")
+    if not url:
+        return None
+    expires = cdn_url_expiry(url)
+    if expires is not None and expires - BANNER_URL_MARGIN < time.time():
+        return None
+    return url
+
+
+def remember_banner_url(user_id: int, message: Optional[nextcord.Message]) -> None:
+    """Save the CDN URL Discord assigned to an uploaded banner for later renders"""
+    url = uploaded_image_url(message)
+    if not url:
+        return
+    def remember(prof: Dict[str, Any]) -> Dict[str, Any]:
+        if prof.get("banner_file"):
+            prof["banner_url"] = url
+        return prof
+
+    update_profile(user_id, remember)
+
+
+def banner_attachment(embed: nextcord.Embed, prof: Dict[str, Any], placeholder_color: Optional[str] = None) -> Optional[nextcord.File]:
+    """Point the embed at the plain banner; returns the file to upload when no CDN URL can be reused"""
+    banner_url = banner_cdn_url(prof)
+    if banner_url:
+        BANNER_UPLOADS.labels(mode="cdn").inc()
+        embed.set_image(url=banner_url)
+        return None
+    path = prof.get("banner_file")
+    if path and os.path.exists(path):
+        BANNER_UPLOADS.labels(mode="upload").inc()
+        embed.set_image(url=f"attachment://{os.path.basename(path)}")
+        return nextcord.File(path, filename=os.path.basename(path))
+    if placeholder_color:
+        embed.set_image(url=f"https://via.placeholder.com/800x200/{placeholder_color}/FFFFFF?text=Kanzi+Bot+Profile")
+    return None
+
+
+# Profile cards: rendered by Pillow on RENDER_POOL and stored as data/cards/<user>/<key>.png,
+# where key hashes every input that affects the image. The CDN URL of the first upload of a
+# card is cached under the same key, so repeat views neither render nor upload.
+CARDS_DIR = os.path.join(DATA_ROOT, "cards")
+PROFILE_CARD_VERSION = 1
+RENDER_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("KANZI_RENDER_WORKERS", "2")), thread_name_prefix="kanzi-render")
+PROFILE_CARD_RENDER = Histogram('profile_card_render_seconds', 'Time to render a profile card image', buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+PROFILE_CARD_REQUESTS = Counter('profile_card_requests_total', 'Profile card lookups by where the image came from', ['result'])
+
+
+def profile_card_spec(user: nextcord.abc.User, prof: Dict[str, Any], premium: bool, theme: str, progress: float) -> Dict[str, Any]:
+    banner = prof.get("banner_file")
+    banner_version = os.stat(banner).st_mtime_ns if banner and os.path.exists(banner) else None
+    avatar = user.display_avatar
+    return {
+        "version": PROFILE_CARD_VERSION,
+        "name": getattr(user, "display_name", None) or user.name,
+        "color": theme_color(premium, theme),
+        "premium": premium,
+        "progress": int(progress * 100),
+        "badges": [str(b) for b in (prof.get("badges") or [])[:6]],
+        "banner": banner if banner_version else None,
+        "banner_version": banner_version,
+        "avatar": getattr(avatar, "key", None) or str(avatar.url),
+    }
+
+
+def card_font(size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:  # Pillow < 10.1
+            return ImageFont.load_default()
+
+
+def render_profile_card(spec: Dict[str, Any], avatar: Optional[bytes]) -> bytes:
+    """Draw the card as PNG (runs on RENDER_POOL)"""
+    from PIL import Image, ImageDraw, ImageOps
+    w, h = BANNER_SIZE
+    color = spec["color"]
+    rgb = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+    if spec["banner"]:
+        with Image.open(spec["banner"]) as banner:
+            card = ImageOps.fit(banner.convert("RGB"), BANNER_SIZE, Image.LANCZOS).convert("RGBA")
+    else:
+        card = Image.new("RGBA", BANNER_SIZE, rgb + (255,))
+    shade = Image.new("RGBA", BANNER_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(shade).rectangle((0, h - 140, w, h), fill=(0, 0, 0, 160))
+    card = Image.alpha_composite(card, shade)
+    draw = ImageDraw.Draw(card)
+
+    size, x0, y0 = 112, 32, h - 126
+    if avatar:
+        with Image.open(io.BytesIO(avatar)) as img:
+            face = ImageOps.fit(img.convert("RGBA"), (size, size), Image.LANCZOS)
+        mask = Image.new("L", (size, size), 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, size - 1, size - 1), fill=255)
+        card.paste(face, (x0, y0), mask)
+    draw.ellipse((x0 - 3, y0 - 3, x0 + size + 2, y0 + size + 2), outline=rgb, width=4)
+
+    tx = x0 + size + 24
+    draw.text((tx, y0), spec["name"][:32], font=card_font(34), fill=(255, 255, 255))
+    tags = (["PREMIUM"] if spec["premium"] else []) + spec["badges"]
+    if tags:
+        draw.text((tx, y0 + 44), "  •  ".join(tags), font=card_font(18), fill=(255, 215, 0) if spec["premium"] else (220, 220, 220))
+
+    bar_top, bar_bottom, bar_right = y0 + size - 26, y0 + size - 6, w - 120
+    draw.rounded_rectangle((tx, bar_top, bar_right, bar_bottom), radius=10, fill=(70, 70, 70))
+    filled = tx + int((bar_right - tx) * spec["progress"] / 100)
+    if filled > tx + 20:
+        draw.rounded_rectangle((tx, bar_top, filled, bar_bottom), radius=10, fill=rgb)
+    draw.text((bar_right + 16, bar_top - 4), f"{spec['progress']}%", font=card_font(22), fill=(255, 255, 255))
+
+    out = io.BytesIO()
+    card.convert("RGB").save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def card_path(user_id: int, key: str) -> str:
+    return os.path.join(CARDS_DIR, str(user_id), f"{key}.png")
+
+
+def store_card_file(user_id: int, key: str, png: bytes) -> str:
+    """Write the card and drop the user's older cards"""
+    path = card_path(user_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_banner_file(path, png)
+    for entry in os.scandir(os.path.dirname(path)):
+        if entry.name != os.path.basename(path):
+            with contextlib.suppress(OSError):
+                os.remove(entry.path)
+    return path
+
+
+async def attach_profile_card(embed: nextcord.Embed, user: nextcord.abc.User, prof: Dict[str, Any],
+                              premium: bool, theme: str, progress: float) -> tuple:
+    """Point the embed at the user's card. Returns (file to upload or None, card key);
+    the key is None when the card could not be rendered."""
+    spec = profile_card_spec(user, prof, premium, theme, progress)
+    key = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+    url = cache.get(f"card_url_{key}")
+    if url:
+        PROFILE_CARD_REQUESTS.labels(result="cdn").inc()
+        embed.set_image(url=url)
+        return None, key
+    path = card_path(user.id, key)
+    if os.path.exists(path):
+        PROFILE_CARD_REQUESTS.labels(result="disk").inc()
+    else:
+        PROFILE_CARD_REQUESTS.labels(result="render").inc()
+        try:
+            avatar = None
+            with contextlib.suppress(Exception):
+                avatar = await asyncio.wait_for(user.display_avatar.with_size(128).with_static_format("png").read(), 5)
+            with span("profile.render_card"), PROFILE_CARD_RENDER.time():
+                png = await asyncio.get_running_loop().run_in_executor(RENDER_POOL, render_profile_card, spec, avatar)
+            path = await asyncio.to_thread(store_card_file, user.id, key, png)
+        except Exception as e:
+            logger.warning("Profile card render failed", user=user.id, error=str(e))
+            return None, None
+    filename = f"profile-{key[:12]}.png"
+    embed.set_image(url=f"attachment://{filename}")
+    return nextcord.File(path, filename=filename), key
+
+
+def uploaded_image_url(message: Optional[nextcord.Message]) -> Optional[str]:
+    for embed in getattr(message, "embeds", None) or []:
+        if embed.image and embed.image.url and embed.image.url.startswith("https://"):
+            return embed.image.url
+    if getattr(message, "attachments", None):
+        return message.attachments[0].url
+    return None
+
+
+def remember_card_url(key: str, message: Optional[nextcord.Message]) -> None:
+    url = uploaded_image_url(message)
+    if not url:
+        return
+    expires = cdn_url_expiry(url)
+    ttl = expires - BANNER_URL_MARGIN - time.time() if expires else 7 * 86400
+    if ttl > 0:
+        cache.set(f"card_url_{key}", url, expire=ttl)
+
+
+async def send_profile(send, embed: nextcord.Embed, user: nextcord.abc.User, prof: Dict[str, Any], premium: bool,
+                       theme: str, progress: float, placeholder_color: Optional[str] = None) -> None:
+    """Attach the card (or the plain banner if rendering is unavailable), send, and remember upload URLs.
+    `send(**kwargs)` sends the message and returns it."""
+    file, card_key = await attach_profile_card(embed, user, prof, premium, theme, progress)
+    if card_key is None:
+        file = banner_attachment(embed, prof, placeholder_color)
+    kwargs = {"file": file} if file else {}
+    message = await send(embed=embed, view=KanziView.shared(), **kwargs)
+    untrack_panel_message(message)
+    if not file:
+        return
+    try:
+        if card_key:
+            remember_card_url(card_key, message)
+        else:
+            remember_banner_url(user.id, message)
+    except Exception as e:
+        logger.warning("Could not read back uploaded image URL", user=user.id, error=str(e))
 
 
 async def require_premium(ctx: commands.Context) -> bool:
@@ -437,17 +2198,8 @@ async def cmd_profile(ctx: commands.Context):
         value=f"{human_time(total_seconds)}/{human_time(REWARD_LISTEN_SECONDS_REQUIRED)}",
         inline=False,
     )
-    if prof.get("banner_file"):
-        try:
-            file_path = prof["banner_file"]
-            if os.path.exists(file_path):
-                file = nextcord.File(file_path, filename=os.path.basename(file_path))
-                embed.set_image(url=f"attachment://{os.path.basename(file_path)}")
-                await ctx.send(file=file, embed=embed, view=KanziView(ctx.author))
-                return
-        except Exception:
-            pass
-    await ctx.send(embed=embed, view=KanziView(ctx.author))
+    progress = min(total_seconds / REWARD_LISTEN_SECONDS_REQUIRED, 1.0)
+    await send_profile(ctx.send, embed, ctx.author, prof, premium, theme, progress)
 
 @bot.slash_command(name="profile", description="Show your Kanzi profile")
 async def slash_profile(interaction: nextcord.Interaction):
@@ -468,15 +2220,14 @@ async def slash_profile(interaction: nextcord.Interaction):
     bar = "▰" * filled + "▱" * (bar_length - filled)
     embed.add_field(name="Music Reward Progress", value=f"{bar} {int(progress * 100)}%", inline=False)
     embed.set_footer(text="🎵 'Music is the universal language of mankind.' - Henry Wadsworth Longfellow 🎶")
-    if prof.get("banner_file") and os.path.exists(prof["banner_file"]):
-        file = nextcord.File(prof["banner_file"], filename=os.path.basename(prof["banner_file"]))
-        embed.set_image(url=f"attachment://{os.path.basename(prof['banner_file'])}")
-        await interaction.response.send_message(file=file, embed=embed, view=KanziView(interaction.user), ephemeral=True)
-        return
-    # Default CDN image based on theme
+
+    async def send(**kwargs) -> Optional[nextcord.Message]:
+        return await interaction.followup.send(ephemeral=True, **kwargs)
+
+    # A card miss fetches the avatar and renders before anything is sent
+    await interaction.response.defer(ephemeral=True)
     color = "00BCD4" if theme == NEUTRAL_THEME else "FF69B4"
-    embed.set_image(url=f"https://via.placeholder.com/800x200/{color}/FFFFFF?text=Kanzi+Bot+Profile")
-    await interaction.response.send_message(embed=embed, view=KanziView(interaction.user), ephemeral=True)
+    await send_profile(send, embed, interaction.user, prof, premium, theme, progress, placeholder_color=color)
 
 
 @bot.command(name="theme")
@@ -495,9 +2246,7 @@ async def cmd_theme(ctx: commands.Context, subcmd: Optional[str] = None, mode: O
     if subcmd == "toggle":
         if not await require_premium(ctx):
             return
-        prof = load_profile(user_id)
-        prof["theme"] = ANIME_THEME if (prof.get("theme") != ANIME_THEME) else NEUTRAL_THEME
-        save_profile(user_id, prof)
+        prof = update_profile(user_id, flip_theme)
         await ctx.send(f"Toggled theme to {prof['theme']}")
         return
     if subcmd == "set":
@@ -506,9 +2255,7 @@ async def cmd_theme(ctx: commands.Context, subcmd: Optional[str] = None, mode: O
         if mode not in (ANIME_THEME, NEUTRAL_THEME):
             await ctx.send("Allowed modes: anime, neutral")
             return
-        prof = load_profile(user_id)
-        prof["theme"] = mode
-        save_profile(user_id, prof)
+        set_profile_fields(user_id, theme=mode)
         await ctx.send(f"Theme set to {mode}")
         return
     await ctx.send("Unknown theme subcommand")
@@ -520,9 +2267,7 @@ async def slash_theme_toggle(interaction: nextcord.Interaction):
     if not (has_premium(user.id) or is_admin_member(user) or is_owner_member(user)):
         await interaction.response.send_message("Premium required.", ephemeral=True)
         return
-    prof = load_profile(user.id)
-    prof["theme"] = ANIME_THEME if (prof.get("theme") != ANIME_THEME) else NEUTRAL_THEME
-    save_profile(user.id, prof)
+    prof = update_profile(user.id, flip_theme)
     await interaction.response.send_message(f"Toggled theme to {prof['theme']}", ephemeral=True)
 
 @bot.slash_command(name="theme_set", description="Set theme (premium)")
@@ -532,9 +2277,7 @@ async def slash_theme_set(interaction: nextcord.Interaction, mode: str = nextcor
     if not (has_premium(user.id) or is_admin_member(user) or is_owner_member(user)):
         await interaction.response.send_message("Premium required.", ephemeral=True)
         return
-    prof = load_profile(user.id)
-    prof["theme"] = mode
-    save_profile(user.id, prof)
+    set_profile_fields(user.id, theme=mode)
     await interaction.response.send_message(f"Theme set to {mode}", ephemeral=True)
 
 @bot.slash_command(name="theme_status", description="Show current theme")
@@ -563,9 +2306,7 @@ async def cmd_premium(ctx: commands.Context, action: Optional[str] = None, user:
         if not user:
             await ctx.send("Please mention a target user.")
             return
-        prof = load_profile(user.id)
-        prof["premium"] = (action == "grant")
-        save_profile(user.id, prof)
+        set_profile_fields(user.id, premium=(action == "grant"))
         await ctx.send(f"Premium {'granted' if action=='grant' else 'revoked'} for {user.mention}")
         return
     await ctx.send("Unknown premium action")
@@ -581,9 +2322,7 @@ async def slash_premium_grant(interaction: nextcord.Interaction, user: nextcord.
     if not (is_admin_member(interaction.user) or is_owner_member(interaction.user)):
         await interaction.response.send_message("Only admins/owner may grant premium.", ephemeral=True)
         return
-    prof = load_profile(user.id)
-    prof["premium"] = True
-    save_profile(user.id, prof)
+    set_profile_fields(user.id, premium=True)
     await interaction.response.send_message(f"Premium granted for {user.mention}", ephemeral=True)
 
 @bot.slash_command(name="premium_revoke", description="Revoke premium from a user (admin/owner)")
@@ -591,9 +2330,7 @@ async def slash_premium_revoke(interaction: nextcord.Interaction, user: nextcord
     if not (is_admin_member(interaction.user) or is_owner_member(interaction.user)):
         await interaction.response.send_message("Only admins/owner may revoke premium.", ephemeral=True)
         return
-    prof = load_profile(user.id)
-    prof["premium"] = False
-    save_profile(user.id, prof)
+    set_profile_fields(user.id, premium=False)
     await interaction.response.send_message(f"Premium revoked for {user.mention}", ephemeral=True)
 
 
@@ -604,11 +2341,7 @@ async def cmd_owner(ctx: commands.Context, action: Optional[str] = None):
         if not is_owner_member(ctx.author):
             await ctx.send("Only the owner can override.")
             return
-        prof = load_profile(actor_id)
-        prof["premium"] = True
-        prof["premium_unlocked_by_reward"] = True
-        prof["premium_preview_until"] = (datetime.now(timezone.utc) + timedelta(days=3650)).isoformat()
-        save_profile(actor_id, prof)
+        apply_owner_override(actor_id)
         await ctx.send("Owner override applied. All premium features unlocked.")
         return
     await ctx.send("Usage: !owner override")
@@ -619,11 +2352,7 @@ async def slash_owner_override(interaction: nextcord.Interaction):
     if not is_owner_member(actor):
         await interaction.response.send_message("Only the owner can override.", ephemeral=True)
         return
-    prof = load_profile(actor.id)
-    prof["premium"] = True
-    prof["premium_unlocked_by_reward"] = True
-    prof["premium_preview_until"] = (datetime.now(timezone.utc) + timedelta(days=3650)).isoformat()
-    save_profile(actor.id, prof)
+    apply_owner_override(actor.id)
     await interaction.response.send_message("Owner override applied. All premium features unlocked.", ephemeral=True)
 
 
@@ -664,14 +2393,194 @@ def is_allowed_music_link(link: str) -> bool:
     if not link.lower().startswith(("http://", "https://")):
         return False
     try:
-        from urllib.parse import urlparse
-        host = urlparse(link).netloc.lower()
-        for dom in ALLOWED_MUSIC_DOMAINS:
-            if host.endswith(dom):
-                return True
-        return False
+        from urllib.parse import urlparse
+        host = urlparse(link).netloc.lower()
+        for dom in ALLOWED_MUSIC_DOMAINS:
+            if host.endswith(dom):
+                return True
+        return False
+    except Exception:
+        return False
+
+
+# Upstream base URLs (overridable so benchmarks can point them at local stubs)
+JIKAN_API_URL = os.getenv("KANZI_JIKAN_URL", "https://api.jikan.moe/v4")
+IGDB_API_URL = os.getenv("KANZI_IGDB_URL", "https://api.igdb.com/v4")
+JOKE_API_URL = os.getenv("KANZI_JOKE_URL", "https://official-joke-api.appspot.com")
+MEME_API_URL = os.getenv("KANZI_MEME_URL", "https://meme-api.com")
+FACTS_API_URL = os.getenv("KANZI_FACTS_URL", "https://uselessfacts.jsph.pl")
+AUDIODB_API_URL = os.getenv("KANZI_AUDIODB_URL", "https://www.theaudiodb.com/api/v1/json")
+
+# Upstream pacing: requests per second and burst size for each API
+UPSTREAM_LIMITS = {
+    "jikan": (3.0, 3),
+    "igdb": (4.0, 4),
+    "theaudiodb": (2.0, 2),
+    "spotify": (5.0, 5),
+    "openai": (3.0, 3),
+    "joke": (5.0, 5),
+    "meme": (5.0, 5),
+    "uselessfacts": (5.0, 5),
+}
+UPSTREAM_QUEUE_DEADLINE = 8.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+STALE_CACHE_SECONDS = 7 * 24 * 60 * 60
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream call is throttled past its deadline or the circuit is open."""
+
+
+class TokenBucket:
+    """Token bucket that queues callers in arrival order until a token frees up."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, timeout: float) -> float:
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            await asyncio.wait_for(self._lock.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamUnavailable("rate limit queue deadline exceeded")
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                wait = (1 - self.tokens) / self.rate
+                if now + wait > deadline:
+                    raise UpstreamUnavailable("rate limit queue deadline exceeded")
+                await asyncio.sleep(wait)
+        finally:
+            self._lock.release()
+
+
+class CircuitBreaker:
+    """Opens after repeated failures and lets a single probe through after the cooldown."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, api: str, failure_threshold: int, cooldown: float):
+        self.api = api
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        REQUEST_CIRCUIT_STATE.labels(api=self.api).set(self.STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                return False
+            self.probing = True
+        return True
+
+    def release_probe(self) -> None:
+        self.probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probing = False
+        if self.state != self.CLOSED:
+            logger.info("Circuit closed", api=self.api)
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit opened", api=self.api, failures=self.failures)
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+class UpstreamCall:
+    """Lets the caller report HTTP status so throttling and server errors trip the breaker."""
+
+    def __init__(self):
+        self.failed = False
+
+    def observe_status(self, status: int) -> None:
+        if status == 429 or status >= 500:
+            self.failed = True
+
+
+upstream_buckets: Dict[str, TokenBucket] = {
+    api: TokenBucket(rate, burst) for api, (rate, burst) in UPSTREAM_LIMITS.items()
+}
+upstream_breakers: Dict[str, CircuitBreaker] = {
+    api: CircuitBreaker(api, BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS) for api in UPSTREAM_LIMITS
+}
+
+
+@contextlib.asynccontextmanager
+async def upstream_guard(api: str):
+    """Pace a call to `api` and track its health; raises UpstreamUnavailable when it should not be made."""
+    breaker = upstream_breakers[api]
+    if not breaker.allow():
+        REQUEST_COUNT.labels(api=api, status='circuit_open').inc()
+        raise UpstreamUnavailable(f"{api} is temporarily unavailable")
+    try:
+        waited = await upstream_buckets[api].acquire(UPSTREAM_QUEUE_DEADLINE)
+    except UpstreamUnavailable:
+        breaker.release_probe()
+        REQUEST_COUNT.labels(api=api, status='throttled').inc()
+        raise UpstreamUnavailable(f"{api} is busy, try again shortly")
+    REQUEST_WAIT.labels(api=api).observe(waited)
+    call = UpstreamCall()
+    started = time.perf_counter()
+    try:
+        with span(f"http {api}", api=api, queued_ms=round(waited * 1000, 1)):
+            yield call
     except Exception:
-        return False
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Cancellation, or GeneratorExit from an abandoned stream: no verdict, but free the half-open probe
+        breaker.release_probe()
+        raise
+    finally:
+        REQUEST_LATENCY.labels(api=api).observe(time.perf_counter() - started)
+    if call.failed:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def cache_set(key: str, value: Any, expire: int) -> None:
+    """Cache a fresh upstream result and keep a long-lived stale copy for outages."""
+    cache.set(key, value, expire=expire)
+    cache.set(f"stale_{key}", value, expire=STALE_CACHE_SECONDS)
+
+
+def stale_cache_get(key: str, default: Any) -> Any:
+    return cache.get(f"stale_{key}", default)
 
 
 # API Integration Functions
@@ -681,17 +2590,254 @@ async def fetch_anime_info(query: str) -> Dict[str, Any]:
     if cache_key in cache:
         return cache[cache_key]
     
-    url = f"https://api.jikan.moe/v4/anime?q={query}&limit=1"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            REQUEST_COUNT.labels(api='jikan', status=resp.status).inc()
-            with REQUEST_LATENCY.labels(api='jikan').time():
-                if resp.status == 200:
-                    data = await resp.json()
-                    result = data.get('data', [{}])[0] if data.get('data') else {}
-                    cache.set(cache_key, result, expire=3600)
-                    return result
-    return {}
+    url = f"{JIKAN_API_URL}/anime?q={query}&limit=1"
+    try:
+        async with upstream_guard('jikan') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='jikan', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json()
+                        result = data.get('data', [{}])[0] if data.get('data') else {}
+                        cache_set(cache_key, result, expire=3600)
+                        anime_index.add(result)
+                        return result
+    except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Jikan unavailable", error=str(e))
+    return stale_cache_get(cache_key, {})
+
+
+# Anime recommendations: every title Jikan returns is appended to data/anime/catalog.jsonl and
+# encoded as a unit vector over its genres, themes, demographics and type. "More like X" and
+# "based on my searches" are a single matrix-vector product over the catalog plus a small
+# score bonus. The vectors are rebuilt from the catalog on first use, then grow incrementally.
+ANIME_DIR = os.path.join(DATA_ROOT, "anime")
+ANIME_CATALOG_FILE = os.path.join(ANIME_DIR, "catalog.jsonl")
+ANIME_FEATURES = 256
+ANIME_TAG_WEIGHTS = {"genres": 1.0, "explicit_genres": 1.0, "themes": 0.8, "demographics": 0.5}
+ANIME_SCORE_WEIGHT = 0.15
+ANIME_SEARCH_HISTORY = 20
+ANIME_REC_LIMIT = 5
+
+ANIME_REC_LATENCY = Histogram('anime_rec_query_seconds', 'Nearest-neighbour query time for anime recommendations',
+                              buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+ANIME_CATALOG_SIZE = Gauge('anime_catalog_titles', 'Titles in the local anime recommendation catalog')
+
+
+def anime_catalog_entry(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Slim a Jikan anime object down to what the index keeps"""
+    if not data.get("mal_id"):
+        return None
+    tags = [f"{field}:{t['name']}" for field in ANIME_TAG_WEIGHTS for t in (data.get(field) or []) if t.get("name")]
+    if data.get("type"):
+        tags.append(f"type:{data['type']}")
+    return {
+        "id": int(data["mal_id"]),
+        "title": data.get("title_english") or data.get("title") or "Unknown",
+        "alt": data.get("title") or "",
+        "url": data.get("url") or "",
+        "score": data.get("score"),
+        "tags": tags,
+    }
+
+
+class AnimeIndex:
+    def __init__(self, path: str, dims: int = ANIME_FEATURES):
+        self.path = path
+        self.dims = dims
+        self.np = None
+        self.loaded = False
+        self.unavailable = False
+        self.items: List[Dict[str, Any]] = []
+        self.rows: Dict[int, int] = {}
+        self.titles: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self.vectors = None
+        self.quality = None
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._load_lock = asyncio.Lock()
+        # Catalog appends are batched and written from a worker thread; _on_disk is the file's
+        # latest entry per id, read on the first write so repeats are never appended twice
+        self._unwritten: Dict[int, Dict[str, Any]] = {}
+        self._on_disk: Optional[Dict[int, Dict[str, Any]]] = None
+        self._write_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    def _encode(self, row: int, entry: Dict[str, Any]) -> None:
+        vec = self.vectors[row]
+        vec[:] = 0
+        for tag in entry["tags"]:
+            col = self.vocab.get(tag)
+            if col is None:
+                if len(self.vocab) >= self.dims:
+                    continue
+                col = self.vocab[tag] = len(self.vocab)
+            field = tag.partition(":")[0]
+            vec[col] = ANIME_TAG_WEIGHTS.get(field, 0.3)
+        norm = float(self.np.linalg.norm(vec))
+        if norm:
+            vec /= norm
+        self.quality[row] = (entry.get("score") or 0) / 10
+
+    def _put(self, entry: Dict[str, Any]) -> None:
+        row = self.rows.get(entry["id"])
+        if row is None:
+            row = len(self.items)
+            if row == len(self.vectors):
+                self.vectors = self.np.concatenate([self.vectors, self.np.zeros_like(self.vectors)])
+                self.quality = self.np.concatenate([self.quality, self.np.zeros_like(self.quality)])
+            self.items.append(entry)
+            self.rows[entry["id"]] = row
+        else:
+            self.items[row] = entry
+        for title in (entry["title"], entry["alt"]):
+            if title:
+                self.titles[title.casefold()] = row
+        self._encode(row, entry)
+
+    def load(self) -> None:
+        """Rebuild the vectors from the catalog file (runs in a worker thread)"""
+        import numpy
+        self.np = numpy
+        self.vectors = numpy.zeros((1024, self.dims), dtype=numpy.float32)
+        self.quality = numpy.zeros(1024, dtype=numpy.float32)
+        with contextlib.suppress(FileNotFoundError), open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                with contextlib.suppress(ValueError, KeyError):
+                    self._put(json.loads(line))
+
+    async def ensure_loaded(self) -> bool:
+        if self.loaded or self.unavailable:
+            return self.loaded
+        async with self._load_lock:
+            if not self.loaded:
+                try:
+                    with span("anime_index.load"):
+                        await asyncio.to_thread(self.load)
+                except ImportError:
+                    logger.warning("numpy is not installed; anime recommendations use the curated list")
+                    self.unavailable = True
+                    self._pending.clear()
+                    return False
+                for entry in self._pending.values():
+                    self._put(entry)
+                self._pending.clear()
+                self.loaded = True
+                ANIME_CATALOG_SIZE.set(len(self.items))
+        return True
+
+    def add(self, data: Dict[str, Any]) -> Optional[int]:
+        """Add or refresh a Jikan result; returns its id"""
+        entry = anime_catalog_entry(data)
+        if entry is None:
+            return None
+        if self._known(entry):
+            return entry["id"]
+        if self.loaded:
+            self._put(entry)
+            ANIME_CATALOG_SIZE.set(len(self.items))
+        elif not self.unavailable:
+            self._pending[entry["id"]] = entry
+        self._unwritten[entry["id"]] = entry
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self.flush())
+        return entry["id"]
+
+    def _known(self, entry: Dict[str, Any]) -> bool:
+        eid = entry["id"]
+        if self.loaded:
+            row = self.rows.get(eid)
+            if row is not None and self.items[row] == entry:
+                return True
+        return self._pending.get(eid) == entry or self._unwritten.get(eid) == entry
+
+    async def flush(self) -> None:
+        """Write queued entries to the catalog file off the event loop"""
+        async with self._write_lock:
+            while self._unwritten:
+                batch = list(self._unwritten.values())
+                self._unwritten.clear()
+                try:
+                    await asyncio.to_thread(self._append, batch)
+                except OSError as e:
+                    logger.warning("Anime catalog write failed", entries=len(batch), error=str(e))
+
+    def _append(self, batch: List[Dict[str, Any]]) -> None:
+        if self._on_disk is None:
+            on_disk: Dict[int, Dict[str, Any]] = {}
+            with contextlib.suppress(FileNotFoundError), open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    with contextlib.suppress(ValueError, KeyError):
+                        entry = json.loads(line)
+                        on_disk[entry["id"]] = entry
+            self._on_disk = on_disk
+        fresh = [entry for entry in batch if self._on_disk.get(entry["id"]) != entry]
+        if not fresh:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in fresh))
+        for entry in fresh:
+            self._on_disk[entry["id"]] = entry
+
+    def find(self, title: str) -> Optional[int]:
+        row = self.titles.get(title.casefold().strip())
+        return self.items[row]["id"] if row is not None else None
+
+    def similar(self, seeds: List[int], limit: int = ANIME_REC_LIMIT) -> List[Dict[str, Any]]:
+        """Titles closest to the seeds (later seeds weigh more), excluding the seeds"""
+        np = self.np
+        rows = [self.rows[s] for s in seeds if s in self.rows]
+        n = len(self.items)
+        if not rows or n <= len(set(rows)):
+            return []
+        with ANIME_REC_LATENCY.time():
+            weights = np.linspace(0.5, 1.0, len(rows), dtype=np.float32)
+            query = weights @ self.vectors[rows]
+            norm = float(np.linalg.norm(query))
+            if not norm:
+                return []
+            scores = self.vectors[:n] @ (query / norm) + ANIME_SCORE_WEIGHT * self.quality[:n]
+            scores[rows] = -np.inf
+            k = min(limit, n - len(set(rows)))
+            best = np.argpartition(scores, n - k)[n - k:]
+            best = best[np.argsort(scores[best])[::-1]]
+        return [self.items[i] for i in best]
+
+
+anime_index = AnimeIndex(ANIME_CATALOG_FILE)
+
+
+def remember_anime_search(user_id: int, anime_id: Optional[int]) -> None:
+    if not anime_id:
+        return
+    key = f"anime_searches_{user_id}"
+    seen = [a for a in cache.get(key, []) if a != anime_id]
+    cache.set(key, (seen + [anime_id])[-ANIME_SEARCH_HISTORY:])
+
+
+async def anime_recommendations_embed(user_id: int, theme: str, like: Optional[str] = None) -> nextcord.Embed:
+    """Recommendations similar to `like`, or to the user's recent /anime_search results.
+    Falls back to the curated list when the catalog has nothing to offer."""
+    if await anime_index.ensure_loaded():
+        if like:
+            seed = anime_index.find(like)
+            if seed is None:
+                seed = anime_index.add(await fetch_anime_info(like))
+            seeds, title = ([seed] if seed else []), f"More like {like}"
+        else:
+            seeds, title = cache.get(f"anime_searches_{user_id}", []), "Because you searched…"
+        picks = anime_index.similar(seeds)
+        if picks:
+            lines = []
+            for item in picks:
+                name = f"[{item['title']}]({item['url']})" if item["url"] else item["title"]
+                lines.append(f"• {name}" + (f" ⭐ {item['score']}" if item.get("score") else ""))
+            return nextcord.Embed(title=title, description="\n".join(lines), color=0xE91E63)
+    embed = anime_recs_embed(theme)
+    if like:
+        embed.set_footer(text=f"Not enough titles like {like} yet, here are some favourites. Try /anime_search to grow the catalog!")
+    return embed
 
 
 async def fetch_game_info(query: str) -> Dict[str, Any]:
@@ -705,7 +2851,7 @@ async def fetch_game_info(query: str) -> Dict[str, Any]:
     if not client_id or not access_token:
         return {}
     
-    url = "https://api.igdb.com/v4/games"
+    url = f"{IGDB_API_URL}/games"
     headers = {
         'Client-ID': client_id,
         'Authorization': f"Bearer {access_token}"
@@ -713,17 +2859,19 @@ async def fetch_game_info(query: str) -> Dict[str, Any]:
     body = f'search "{query}"; fields name,summary,cover.url,genres.name,platforms.name; limit 1;'
     
     try:
-        response = requests.post(url, headers=headers, data=body)
-        REQUEST_COUNT.labels(api='igdb', status=response.status_code).inc()
-        with REQUEST_LATENCY.labels(api='igdb').time():
-            if response.status_code == 200:
-                data = response.json()
-                result = data[0] if data else {}
-                cache.set(cache_key, result, expire=3600)
-                return result
+        async with upstream_guard('igdb') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, headers=headers, data=body, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='igdb', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json(content_type=None)
+                        result = data[0] if data else {}
+                        cache_set(cache_key, result, expire=3600)
+                        return result
     except Exception as e:
         logger.error("IGDB search failed", error=str(e))
-    return {}
+    return stale_cache_get(cache_key, {})
 
 
 async def fetch_joke() -> str:
@@ -732,17 +2880,21 @@ async def fetch_joke() -> str:
     if cache_key in cache:
         return cache[cache_key]
     
-    url = "https://official-joke-api.appspot.com/random_joke"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            REQUEST_COUNT.labels(api='joke', status=resp.status).inc()
-            with REQUEST_LATENCY.labels(api='joke').time():
-                if resp.status == 200:
-                    data = await resp.json()
-                    joke = f"{data['setup']} - {data['punchline']}"
-                    cache.set(cache_key, joke, expire=300)
-                    return joke
-    return "Why did the scarecrow win an award? Because he was outstanding in his field!"
+    url = f"{JOKE_API_URL}/random_joke"
+    try:
+        async with upstream_guard('joke') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='joke', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json()
+                        joke = f"{data['setup']} - {data['punchline']}"
+                        cache_set(cache_key, joke, expire=300)
+                        return joke
+    except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Joke API unavailable", error=str(e))
+    return stale_cache_get(cache_key, "Why did the scarecrow win an award? Because he was outstanding in his field!")
 
 
 async def fetch_meme() -> Dict[str, Any]:
@@ -751,16 +2903,20 @@ async def fetch_meme() -> Dict[str, Any]:
     if cache_key in cache:
         return cache[cache_key]
     
-    url = "https://meme-api.com/gimme"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            REQUEST_COUNT.labels(api='meme', status=resp.status).inc()
-            with REQUEST_LATENCY.labels(api='meme').time():
-                if resp.status == 200:
-                    data = await resp.json()
-                    cache.set(cache_key, data, expire=300)
-                    return data
-    return {"title": "Meme unavailable", "url": ""}
+    url = f"{MEME_API_URL}/gimme"
+    try:
+        async with upstream_guard('meme') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='meme', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json()
+                        cache_set(cache_key, data, expire=300)
+                        return data
+    except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Meme API unavailable", error=str(e))
+    return stale_cache_get(cache_key, {"title": "Meme unavailable", "url": ""})
 
 
 async def fetch_nature_fact() -> str:
@@ -769,17 +2925,21 @@ async def fetch_nature_fact() -> str:
     if cache_key in cache:
         return cache[cache_key]
     
-    url = "https://uselessfacts.jsph.pl/random.json?language=en"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            REQUEST_COUNT.labels(api='uselessfacts', status=resp.status).inc()
-            with REQUEST_LATENCY.labels(api='uselessfacts').time():
-                if resp.status == 200:
-                    data = await resp.json()
-                    fact = data.get('text', 'Nature is amazing!')
-                    cache.set(cache_key, fact, expire=3600)
-                    return fact
-    return "Did you know? The Earth's core is as hot as the surface of the Sun."
+    url = f"{FACTS_API_URL}/random.json?language=en"
+    try:
+        async with upstream_guard('uselessfacts') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='uselessfacts', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json()
+                        fact = data.get('text', 'Nature is amazing!')
+                        cache_set(cache_key, fact, expire=3600)
+                        return fact
+    except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning("Facts API unavailable", error=str(e))
+    return stale_cache_get(cache_key, "Did you know? The Earth's core is as hot as the surface of the Sun.")
 
 
 async def roll_dice(sides: int = 6) -> int:
@@ -790,7 +2950,7 @@ async def roll_dice(sides: int = 6) -> int:
 
 async def search_spotify(query: str) -> Dict[str, Any]:
     """Search Spotify for tracks"""
-    if not spotify_client:
+    if not spotify_configured():
         return {}
     
     cache_key = f"spotify_{query}"
@@ -798,13 +2958,16 @@ async def search_spotify(query: str) -> Dict[str, Any]:
         return cache[cache_key]
     
     try:
-        results = spotify_client.search(q=query, type='track', limit=1)
+        async with upstream_guard('spotify'):
+            client = spotify_client or await asyncio.to_thread(get_spotify_client)
+            results = await asyncio.to_thread(client.search, q=query, type='track', limit=1)
+            REQUEST_COUNT.labels(api='spotify', status=200).inc()
         track = results['tracks']['items'][0] if results['tracks']['items'] else {}
-        cache.set(cache_key, track, expire=3600)
+        cache_set(cache_key, track, expire=3600)
         return track
     except Exception as e:
         logger.error("Spotify search failed", error=str(e))
-        return {}
+        return stale_cache_get(cache_key, {})
 
 
 async def get_artist_info(artist: str) -> Dict[str, Any]:
@@ -818,20 +2981,410 @@ async def get_artist_info(artist: str) -> Dict[str, Any]:
         return {}
     
     try:
-        url = f"https://www.theaudiodb.com/api/v1/json/{api_key}/search.php?s={artist}"
-        response = requests.get(url)
-        REQUEST_COUNT.labels(api='theaudiodb', status=response.status_code).inc()
-        with REQUEST_LATENCY.labels(api='theaudiodb').time():
-            if response.status_code == 200:
-                data = response.json()
-                artists = data.get('artists', [])
-                if artists:
-                    info = artists[0]
-                    cache.set(cache_key, info, expire=3600)
-                    return info
+        url = f"{AUDIODB_API_URL}/{api_key}/search.php?s={artist}"
+        async with upstream_guard('theaudiodb') as call:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    REQUEST_COUNT.labels(api='theaudiodb', status=resp.status).inc()
+                    call.observe_status(resp.status)
+                    if resp.status == 200:
+                        data = await resp.json(content_type=None)
+                        artists = data.get('artists') or []
+                        if artists:
+                            info = artists[0]
+                            cache_set(cache_key, info, expire=3600)
+                            return info
+                        return {}
     except Exception as e:
         logger.error("AudioDB artist search failed", error=str(e))
-    return {}
+    return stale_cache_get(cache_key, {})
+
+
+async def openai_chat_stream(prompt: str, max_tokens: int):
+    """Stream a chat completion through the OpenAI upstream guard, yielding text deltas"""
+    async with upstream_guard('openai'):
+        openai = get_openai() if _openai_module else await asyncio.to_thread(get_openai)
+        stream = await openai.ChatCompletion.acreate(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            stream=True
+        )
+        REQUEST_COUNT.labels(api='openai', status=200).inc()
+        async for chunk in stream:
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+# Admission control for heavy commands. Each command belongs to a cost class; a request runs
+# once its cost fits under both the global and its guild's capacity, otherwise it waits in a
+# bounded FIFO queue until it fits or its deadline passes. Guild caps stop one busy server
+# (or a raid) from taking every slot.
+ADMISSION_COSTS = {
+    "play": 4,      # extraction + voice connect + ffmpeg
+    "ai": 3,
+    "addsong": 2,   # metadata extraction
+    "banner": 2,    # download + image normalization
+    "search": 1,    # cached upstream lookups
+}
+ADMISSION_CAPACITY = int(os.getenv("KANZI_ADMISSION_CAPACITY", "48"))
+ADMISSION_GUILD_CAPACITY = int(os.getenv("KANZI_ADMISSION_GUILD_CAPACITY", "12"))
+ADMISSION_QUEUE_LIMIT = int(os.getenv("KANZI_ADMISSION_QUEUE", "200"))
+ADMISSION_WAIT = float(os.getenv("KANZI_ADMISSION_WAIT_SECONDS", "20"))
+
+ADMISSION_QUEUE_TIME = Histogram(
+    'admission_queue_seconds',
+    'Time heavy commands waited for admission',
+    ['cost_class'],
+    buckets=(0.0, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0),
+)
+ADMISSION_REJECTED = Counter('admission_rejected_total', 'Heavy commands turned away by admission control', ['cost_class', 'reason'])
+ADMISSION_IN_USE = Gauge('admission_cost_in_use', 'Cost units held by running heavy commands')
+ADMISSION_QUEUED = Gauge('admission_queue_depth', 'Heavy commands waiting for admission')
+
+
+class AdmissionRejected(Exception):
+    """Raised when a heavy command cannot be admitted (queue full or deadline passed)."""
+
+
+class AdmissionLease:
+    """Held while an admitted command runs; releases its cost on exit."""
+
+    def __init__(self, controller: "AdmissionController", guild_id: Optional[int], cost: int):
+        self._controller = controller
+        self._guild_id = guild_id
+        self._cost = cost
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self._guild_id, self._cost)
+
+    def __enter__(self) -> "AdmissionLease":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, capacity: int, guild_capacity: int, queue_limit: int, wait: float):
+        self.capacity = capacity
+        self.guild_capacity = guild_capacity
+        self.queue_limit = queue_limit
+        self.wait = wait
+        self.closed = False
+        self._in_use = 0
+        self._guild_in_use: Dict[int, int] = {}
+        self._waiters: collections.deque = collections.deque()
+
+    def close(self) -> None:
+        """Stop admitting for shutdown; queued requests are turned away"""
+        self.closed = True
+        for _, _, fut in self._waiters:
+            if not fut.done():
+                ADMISSION_REJECTED.labels(cost_class="queued", reason="shutdown").inc()
+                fut.set_exception(AdmissionRejected("Kanzi is restarting, please try again in a few seconds."))
+        self._waiters.clear()
+        ADMISSION_QUEUED.set(0)
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for running commands to release their cost; False if some were still running"""
+        deadline = time.monotonic() + timeout
+        while self._in_use and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return not self._in_use
+
+    def _fits(self, guild_id: Optional[int], cost: int) -> bool:
+        if self._in_use + cost > self.capacity:
+            return False
+        return guild_id is None or self._guild_in_use.get(guild_id, 0) + cost <= self.guild_capacity
+
+    def _take(self, guild_id: Optional[int], cost: int) -> None:
+        self._in_use += cost
+        if guild_id is not None:
+            self._guild_in_use[guild_id] = self._guild_in_use.get(guild_id, 0) + cost
+        ADMISSION_IN_USE.set(self._in_use)
+
+    def _release(self, guild_id: Optional[int], cost: int) -> None:
+        self._in_use -= cost
+        if guild_id is not None:
+            remaining = self._guild_in_use.get(guild_id, 0) - cost
+            if remaining > 0:
+                self._guild_in_use[guild_id] = remaining
+            else:
+                self._guild_in_use.pop(guild_id, None)
+        ADMISSION_IN_USE.set(self._in_use)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Admit queued requests in order. A request blocked only by its own guild's cap is
+        skipped so other guilds keep moving; one blocked by global capacity holds the line."""
+        for waiter in list(self._waiters):
+            guild_id, cost, fut = waiter
+            if fut.done():
+                self._waiters.remove(waiter)
+                continue
+            if self._in_use + cost > self.capacity:
+                break
+            if self._fits(guild_id, cost):
+                self._waiters.remove(waiter)
+                self._take(guild_id, cost)
+                fut.set_result(True)
+        ADMISSION_QUEUED.set(len(self._waiters))
+
+    def position(self, fut: asyncio.Future) -> int:
+        for i, waiter in enumerate(self._waiters):
+            if waiter[2] is fut:
+                return i + 1
+        return 0
+
+    async def acquire(self, cost_class: str, guild_id: Optional[int], on_queued=None) -> AdmissionLease:
+        """Wait for room to run a `cost_class` command. `on_queued(position)` is awaited once if
+        the request has to wait. Raises AdmissionRejected."""
+        cost = min(ADMISSION_COSTS.get(cost_class, 1), self.capacity, self.guild_capacity)
+        started = time.perf_counter()
+        if self.closed:
+            ADMISSION_REJECTED.labels(cost_class=cost_class, reason="shutdown").inc()
+            raise AdmissionRejected("Kanzi is restarting, please try again in a few seconds.")
+        if not self._waiters and self._fits(guild_id, cost):
+            self._take(guild_id, cost)
+            ADMISSION_QUEUE_TIME.labels(cost_class=cost_class).observe(0.0)
+            return AdmissionLease(self, guild_id, cost)
+        if len(self._waiters) >= self.queue_limit:
+            ADMISSION_REJECTED.labels(cost_class=cost_class, reason="queue_full").inc()
+            raise AdmissionRejected("Kanzi is very busy right now, please try again in a minute.")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((guild_id, cost, fut))
+        self._wake()  # the requests ahead may be blocked only by their own guild's cap
+        try:
+            if on_queued is not None and not fut.done():
+                with contextlib.suppress(Exception):
+                    await on_queued(self.position(fut))
+            await asyncio.wait_for(fut, max(0.0, self.wait - (time.perf_counter() - started)))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # Admitted just as we gave up; hand the slot back
+                self._release(guild_id, cost)
+            else:
+                fut.cancel()
+                self._wake()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTED.labels(cost_class=cost_class, reason="deadline").inc()
+            raise AdmissionRejected("Kanzi is busy and your request timed out in the queue, please try again.")
+        ADMISSION_QUEUE_TIME.labels(cost_class=cost_class).observe(time.perf_counter() - started)
+        return AdmissionLease(self, guild_id, cost)
+
+
+admission = AdmissionController(ADMISSION_CAPACITY, ADMISSION_GUILD_CAPACITY, ADMISSION_QUEUE_LIMIT, ADMISSION_WAIT)
+
+
+async def admit_interaction(interaction: nextcord.Interaction, cost_class: str, ephemeral: bool = True) -> Optional[AdmissionLease]:
+    """Defer, then wait for admission while showing the queue position.
+    Returns None after telling the user when the request was rejected."""
+    if not interaction.response.is_done():
+        await interaction.response.defer(ephemeral=ephemeral)
+    queued: List[Any] = []
+
+    async def on_queued(position: int) -> None:
+        queued.append(await interaction.followup.send(f"⏳ Lots going on right now, you're #{position} in the queue…", ephemeral=True))
+
+    try:
+        return await admission.acquire(cost_class, interaction.guild_id, on_queued)
+    except AdmissionRejected as e:
+        await interaction.followup.send(f"⏳ {e}", ephemeral=True)
+        return None
+    finally:
+        for message in queued:
+            with contextlib.suppress(Exception):
+                await message.delete()
+
+
+async def admit_context(ctx: commands.Context, cost_class: str) -> Optional[AdmissionLease]:
+    """Prefix-command counterpart of admit_interaction"""
+    queued: List[Any] = []
+
+    async def on_queued(position: int) -> None:
+        queued.append(await ctx.send(f"⏳ Lots going on right now, you're #{position} in the queue…"))
+
+    try:
+        return await admission.acquire(cost_class, ctx.guild.id if ctx.guild else None, on_queued)
+    except AdmissionRejected as e:
+        await ctx.send(f"⏳ {e}")
+        return None
+    finally:
+        for message in queued:
+            with contextlib.suppress(Exception):
+                await message.delete()
+
+
+AI_CACHE_TTL = 6 * 60 * 60
+AI_MAX_CONCURRENCY = int(os.getenv("KANZI_AI_MAX_CONCURRENCY", "4"))
+AI_MAX_CONCURRENCY_PER_USER = 1
+AI_QUEUE_TIMEOUT = 15.0
+AI_USER_DAILY_TOKENS = int(os.getenv("KANZI_AI_USER_DAILY_TOKENS", "20000"))
+AI_GUILD_DAILY_TOKENS = int(os.getenv("KANZI_AI_GUILD_DAILY_TOKENS", "200000"))
+
+AI_CACHE_REQUESTS = Counter('ai_cache_requests_total', 'AI response cache lookups', ['result'])
+AI_TOKENS = Counter('ai_tokens_total', 'Estimated OpenAI tokens spent', ['kind'])
+AI_IN_FLIGHT = Gauge('ai_requests_in_flight', 'AI completions currently running')
+AI_REJECTED = Counter('ai_requests_rejected_total', 'AI requests rejected by the gateway', ['reason'])
+
+
+class AIRejected(Exception):
+    """Raised when the AI gateway refuses a request (budget or concurrency)."""
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split()).strip(" .!?")
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+class AIGateway:
+    """Front door for OpenAI completions: response cache, concurrency limits and daily token budgets."""
+
+    def __init__(self, max_concurrency: int, max_per_user: int):
+        self.max_per_user = max_per_user
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._user_in_flight: Dict[int, int] = {}
+
+    @staticmethod
+    def _budgets(user_id: int, guild_id: Optional[int]) -> List[tuple]:
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        budgets = [("user", f"ai_tokens_user_{user_id}_{day}", AI_USER_DAILY_TOKENS)]
+        if guild_id:
+            budgets.append(("guild", f"ai_tokens_guild_{guild_id}_{day}", AI_GUILD_DAILY_TOKENS))
+        return budgets
+
+    def _check_budget(self, user_id: int, guild_id: Optional[int], reserve: int) -> None:
+        for scope, key, limit in self._budgets(user_id, guild_id):
+            if int(cache.get(key, 0)) + reserve > limit:
+                AI_REJECTED.labels(reason=f"{scope}_budget").inc()
+                if scope == "user":
+                    raise AIRejected("You've used your AI budget for today. Try again tomorrow!")
+                raise AIRejected("This server has used its AI budget for today. Try again tomorrow!")
+
+    def _charge(self, user_id: int, guild_id: Optional[int], prompt_tokens: int, completion_tokens: int) -> None:
+        AI_TOKENS.labels(kind="prompt").inc(prompt_tokens)
+        AI_TOKENS.labels(kind="completion").inc(completion_tokens)
+        for _, key, _ in self._budgets(user_id, guild_id):
+            cache.add(key, 0, expire=2 * 24 * 60 * 60)
+            cache.incr(key, prompt_tokens + completion_tokens)
+
+    async def complete(self, prompt: str, max_tokens: int, user_id: int, guild_id: Optional[int]):
+        """Yield completion text for `prompt`, from cache when the same prompt was answered recently."""
+        key = "ai_" + hashlib.sha256(f"{max_tokens}:{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            AI_CACHE_REQUESTS.labels(result="hit").inc()
+            yield cached
+            return
+        AI_CACHE_REQUESTS.labels(result="miss").inc()
+
+        prompt_tokens = estimate_tokens(prompt)
+        self._check_budget(user_id, guild_id, prompt_tokens + max_tokens)
+        if self._user_in_flight.get(user_id, 0) >= self.max_per_user:
+            AI_REJECTED.labels(reason="user_concurrency").inc()
+            raise AIRejected("You already have an AI request running. Wait for it to finish!")
+        self._user_in_flight[user_id] = self._user_in_flight.get(user_id, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), AI_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                AI_REJECTED.labels(reason="busy").inc()
+                raise AIRejected("AI is busy right now, try again in a moment.")
+            AI_IN_FLIGHT.inc()
+            parts: List[str] = []
+            try:
+                async for delta in openai_chat_stream(prompt, max_tokens):
+                    parts.append(delta)
+                    yield delta
+            finally:
+                self._slots.release()
+                AI_IN_FLIGHT.dec()
+                self._charge(user_id, guild_id, prompt_tokens, estimate_tokens("".join(parts)))
+            cache.set(key, "".join(parts).strip(), expire=AI_CACHE_TTL)
+        finally:
+            remaining = self._user_in_flight.get(user_id, 1) - 1
+            if remaining:
+                self._user_in_flight[user_id] = remaining
+            else:
+                self._user_in_flight.pop(user_id, None)
+
+
+ai_gateway = AIGateway(AI_MAX_CONCURRENCY, AI_MAX_CONCURRENCY_PER_USER)
+
+
+DISCORD_MESSAGE_LIMIT = 2000
+STREAM_EDIT_INTERVAL = 1.2
+
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """Split text into Discord-sized pages, breaking on a newline where possible."""
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    pages.append(text)
+    return pages
+
+
+class StreamingReply:
+    """Edits a deferred interaction response with streamed text at a throttled rate.
+
+    Output past the 2000-character limit continues in ephemeral followup messages.
+    """
+
+    def __init__(self, interaction: nextcord.Interaction, prefix: str, interval: float = STREAM_EDIT_INTERVAL):
+        self.interaction = interaction
+        self.prefix = prefix
+        self.body = ""
+        self.interval = interval
+        self._rendered: List[str] = []
+        self._followups: List[nextcord.WebhookMessage] = []
+        self._last_flush = 0.0
+
+    async def stream(self, deltas) -> str:
+        async for delta in deltas:
+            if not self.body:
+                delta = delta.lstrip()
+            self.body += delta
+            if time.monotonic() - self._last_flush >= self.interval:
+                await self.flush()
+        self.body = self.body.strip()
+        return self.body
+
+    async def finish(self, suffix: str = "") -> None:
+        await self.flush(suffix)
+
+    async def flush(self, suffix: str = "") -> None:
+        self._last_flush = time.monotonic()
+        for i, page in enumerate(split_message(self.prefix + self.body + suffix)):
+            if not page:
+                break
+            if i < len(self._rendered) and self._rendered[i] == page:
+                continue
+            if i == 0:
+                await self.interaction.edit_original_message(content=page)
+            elif i - 1 < len(self._followups):
+                await self._followups[i - 1].edit(content=page)
+            else:
+                self._followups.append(await self.interaction.followup.send(page, ephemeral=True, wait=True))
+            if i < len(self._rendered):
+                self._rendered[i] = page
+            else:
+                self._rendered.append(page)
 
 
 @bot.command(name="playlocal")
@@ -848,16 +3401,12 @@ async def cmd_playlocal(ctx: commands.Context, filename: Optional[str] = None):
         await ctx.send("File not found in data/music/local/")
         return
     try:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         channel: nextcord.VoiceChannel = ctx.author.voice.channel
-        vc: Optional[nextcord.VoiceClient] = ctx.guild.voice_client
-        if vc and vc.is_connected():
-            await vc.move_to(channel)
-        else:
-            vc = await channel.connect()
-        if vc.is_playing():
-            vc.stop()
-        source = nextcord.FFmpegPCMAudio(path)
-        vc.play(source)
+        vc = await connect_voice(ctx.guild, channel, timings)
+        start_playback(vc, path, title=os.path.basename(path), link=path, kind="local",
+                       requested_by=ctx.author.id, command="playlocal", started=started, timings=timings)
         await ctx.send(f"Playing local track: {os.path.basename(path)}")
     except Exception as e:
         await ctx.send(f"Playback error: {e}")
@@ -876,17 +3425,12 @@ async def slash_playlocal(interaction: nextcord.Interaction, filename: str):
         await interaction.response.send_message("File not found in data/music/local/", ephemeral=True)
         return
     try:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
         channel: nextcord.VoiceChannel = member.voice.channel
-        vc: Optional[nextcord.VoiceClient] = interaction.guild.voice_client
-        if vc and vc.is_connected():
-            if vc.channel != channel:
-                await vc.move_to(channel)
-        else:
-            vc = await channel.connect()
-        if vc.is_playing():
-            vc.stop()
-        source = nextcord.FFmpegPCMAudio(path)
-        vc.play(source)
+        vc = await connect_voice(interaction.guild, channel, timings)
+        start_playback(vc, path, title=os.path.basename(path), link=path, kind="local",
+                       requested_by=member.id, command="playlocal", started=started, timings=timings)
         await interaction.response.send_message(f"Playing local track: {os.path.basename(path)}", ephemeral=True)
     except Exception as e:
         await interaction.response.send_message(f"Playback error: {e}", ephemeral=True)
@@ -903,31 +3447,29 @@ async def cmd_play(ctx: commands.Context, link: Optional[str] = None):
     if not ctx.author.voice or not ctx.author.voice.channel:
         await ctx.send("Join a voice channel first.")
         return
-    try:
-        import yt_dlp
-        ydl_opts = {
-            "format": "bestaudio/best",
-            "quiet": True,
-            "nocheckcertificate": True,
-            "noplaylist": True,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(link, download=False)
+    started = time.perf_counter()
+    lease = await admit_context(ctx, "play")
+    if lease is None:
+        return
+    with lease:
+        try:
+            timings: Dict[str, float] = {}
+            ydl_opts = {
+                "format": "bestaudio/best",
+                "quiet": True,
+                "nocheckcertificate": True,
+                "noplaylist": True,
+            }
+            with voice_stage("resolve", timings):
+                info = await run_extraction(extract_info, link, ydl_opts)
             url = info["url"]
-        channel: nextcord.VoiceChannel = ctx.author.voice.channel
-        vc: Optional[nextcord.VoiceClient] = ctx.guild.voice_client
-        if vc and vc.is_connected():
-            if vc.channel != channel:
-                await vc.move_to(channel)
-        else:
-            vc = await channel.connect()
-        if vc.is_playing():
-            vc.stop()
-        source = nextcord.FFmpegPCMAudio(url)
-        vc.play(source)
-        await ctx.send("Playing track from free source.")
-    except Exception as e:
-        await ctx.send(f"Playback error: {e}")
+            channel: nextcord.VoiceChannel = ctx.author.voice.channel
+            vc = await connect_voice(ctx.guild, channel, timings)
+            start_playback(vc, url, title=info.get("title") or link, link=link, kind="stream",
+                           requested_by=ctx.author.id, command="play", started=started, timings=timings)
+            await ctx.send("Playing track from free source.")
+        except Exception as e:
+            await ctx.send(f"Playback error: {e}")
 
 @bot.slash_command(name="play", description="Play from YouTube, SoundCloud, or search by name")
 async def slash_play(interaction: nextcord.Interaction, link: str):
@@ -941,50 +3483,347 @@ async def slash_play(interaction: nextcord.Interaction, link: str):
     if not member or not member.voice or not member.voice.channel:
         await interaction.response.send_message("🎤 Hey there! You need to be in a voice channel to jam with me. Let's get this party started! 'Where words fail, music speaks.' 🎉", ephemeral=True)
         return
-    await interaction.response.defer(ephemeral=True)
-    try:
-        info = auto_solve_playback(link)
-        url = info["url"]
-        channel: nextcord.VoiceChannel = member.voice.channel
-        vc: Optional[nextcord.VoiceClient] = interaction.guild.voice_client
-        if vc and vc.channel == channel:
-            pass
-        elif vc and vc.is_connected():
-            await vc.move_to(channel)
+    started = time.perf_counter()
+    lease = await admit_interaction(interaction, "play")
+    if lease is None:
+        return
+    with lease:
+        try:
+            timings: Dict[str, float] = {}
+            with voice_stage("resolve", timings):
+                info = await run_extraction(auto_solve_playback, link)
+            url = info["url"]
+            channel: nextcord.VoiceChannel = member.voice.channel
+            vc = await connect_voice(interaction.guild, channel, timings)
+            start_playback(vc, url, title=info.get("title") or link, link=info.get("webpage_url") or link, kind="stream",
+                           requested_by=member.id, command="play", started=started, timings=timings)
+            embed = nextcord.Embed(
+                title="🎵 Now Playing",
+                description=f"[{info.get('title', 'Unknown')}]({link})\n\n💬 'Music is the strongest form of magic.' - Marilyn Manson 🎸",
+                color=0x00FF00
+            )
+            embed.add_field(name="Author", value=info.get('uploader', 'Unknown'), inline=True)
+            embed.add_field(name="Duration", value=f"{info.get('duration', 0)}s", inline=True)
+            if info.get('thumbnail'):
+                embed.set_thumbnail(url=info.get('thumbnail'))
+            view = MusicControls.shared()
+            untrack_panel_message(await interaction.followup.send(embed=embed, view=view, ephemeral=True))
+        except Exception as e:
+            await interaction.followup.send(f"🎼 Oops! Something went wrong with playback: {e}. 'Music is my religion.' - Jimi Hendrix 🎶", ephemeral=True)
+
+
+# /play autocomplete: flat SoundCloud searches on their own small pool (so keystrokes never
+# delay real /play resolves on EXTRACT_POOL), debounced per user and cached by normalized
+# query for a short TTL. Each choice carries the track URL as its value,
+# so picking one makes /play resolve that track directly instead of searching again.
+PLAY_SUGGEST_LIMIT = 5
+PLAY_SUGGEST_MIN_CHARS = 3
+PLAY_SUGGEST_DEBOUNCE = 0.35
+PLAY_SUGGEST_TTL = 120
+PLAY_SUGGEST_CACHE_MAX = 2048
+AUTOCOMPLETE_DEADLINE = 2.5  # Discord discards autocomplete answers after 3 seconds
+SUGGEST_WORKERS = int(os.getenv("KANZI_SUGGEST_WORKERS", "2"))
+SUGGEST_POOL = ThreadPoolExecutor(max_workers=SUGGEST_WORKERS, thread_name_prefix="kanzi-suggest")
+
+PLAY_SUGGEST_REQUESTS = Counter('play_autocomplete_requests_total', '/play autocomplete requests by how they were answered', ['result'])
+PLAY_SUGGEST_SEARCH = Histogram('play_autocomplete_search_seconds', 'Flat search time behind /play autocomplete',
+                                buckets=(0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0))
+
+_suggest_cache: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()  # query -> (expires, results)
+_suggest_inflight: Dict[str, asyncio.Future] = {}
+_suggest_latest: Dict[int, int] = {}  # user id -> id of their newest autocomplete interaction
+_suggest_busy = 0
+
+
+class SuggestionsBusy(Exception):
+    """Every suggestion worker is taken; answer from the cache instead of queueing"""
+
+
+def flat_search(query: str, limit: int) -> List[Dict[str, Any]]:
+    """Search without resolving streams (runs on SUGGEST_POOL)"""
+    import yt_dlp
+    opts = {"quiet": True, "nocheckcertificate": True, "extract_flat": True, "skip_download": True}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(f"scsearch{limit}:{query}", download=False)
+    results = []
+    for entry in info.get("entries") or []:
+        url = entry.get("webpage_url") or entry.get("url")
+        if url and len(url) <= 100:
+            results.append({"title": entry.get("title") or url, "uploader": entry.get("uploader"), "duration": entry.get("duration"), "url": url})
+    return results
+
+
+def cached_suggestions(query: str) -> Optional[List[Dict[str, Any]]]:
+    entry = _suggest_cache.get(query)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    _suggest_cache.move_to_end(query)
+    return entry[1]
+
+
+def prefix_suggestions(query: str) -> List[Dict[str, Any]]:
+    """Results for the longest cached prefix of `query`, shown while a fresh search is unavailable"""
+    for end in range(len(query) - 1, PLAY_SUGGEST_MIN_CHARS - 1, -1):
+        results = cached_suggestions(query[:end].rstrip())
+        if results:
+            return results
+    return []
+
+
+async def _search_suggestions(query: str) -> List[Dict[str, Any]]:
+    with PLAY_SUGGEST_SEARCH.time():
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(SUGGEST_POOL, flat_search, query, PLAY_SUGGEST_LIMIT)
+    _suggest_cache[query] = (time.monotonic() + PLAY_SUGGEST_TTL, results)
+    _suggest_cache.move_to_end(query)
+    while len(_suggest_cache) > PLAY_SUGGEST_CACHE_MAX:
+        _suggest_cache.popitem(last=False)
+    return results
+
+
+async def suggest_tracks(query: str) -> List[Dict[str, Any]]:
+    """Cached or fresh suggestions; concurrent callers share one search, and a caller that gives
+    up does not cancel it, so the result still lands in the cache for the next keystroke"""
+    results = cached_suggestions(query)
+    if results is not None:
+        return results
+    global _suggest_busy
+    fut = _suggest_inflight.get(query)
+    if fut is None:
+        if _suggest_busy >= SUGGEST_WORKERS:
+            ADMISSION_REJECTED.labels(cost_class="suggest", reason="busy").inc()
+            raise SuggestionsBusy()
+        _suggest_busy += 1
+        fut = _suggest_inflight[query] = asyncio.ensure_future(_search_suggestions(query))
+
+        def done(f: asyncio.Future) -> None:
+            global _suggest_busy
+            _suggest_busy -= 1
+            _suggest_inflight.pop(query, None)
+            if not f.cancelled():
+                f.exception()  # retrieved here in case every waiter already gave up
+
+        fut.add_done_callback(done)
+    return await asyncio.shield(fut)
+
+
+def suggestion_choices(results: List[Dict[str, Any]]) -> Dict[str, str]:
+    choices = {}
+    for item in results:
+        label = item["title"]
+        if item.get("uploader"):
+            label += f" — {item['uploader']}"
+        if item.get("duration"):
+            label += f" ({int(item['duration']) // 60}:{int(item['duration']) % 60:02d})"
+        choices.setdefault(label[:100], item["url"])
+    return choices
+
+
+@slash_play.on_autocomplete("link")
+async def autocomplete_play(interaction: nextcord.Interaction, link: str):
+    query = " ".join((link or "").casefold().split())
+    if len(query) < PLAY_SUGGEST_MIN_CHARS or query.startswith(("http://", "https://")):
+        await interaction.response.send_autocomplete([])
+        return
+    user_id = interaction.user.id
+    _suggest_latest[user_id] = interaction.id
+    results = cached_suggestions(query)
+    if results is not None:
+        PLAY_SUGGEST_REQUESTS.labels(result="cached").inc()
+    else:
+        await asyncio.sleep(PLAY_SUGGEST_DEBOUNCE)
+        if _suggest_latest.get(user_id) != interaction.id:
+            # The user kept typing; only their newest keystroke searches
+            PLAY_SUGGEST_REQUESTS.labels(result="superseded").inc()
+            await interaction.response.send_autocomplete(suggestion_choices(prefix_suggestions(query)))
+            return
+        try:
+            budget = AUTOCOMPLETE_DEADLINE - seconds_since(interaction.created_at)
+            results = await asyncio.wait_for(suggest_tracks(query), max(0.1, budget))
+            PLAY_SUGGEST_REQUESTS.labels(result="searched").inc()
+        except asyncio.TimeoutError:
+            PLAY_SUGGEST_REQUESTS.labels(result="timeout").inc()
+            results = prefix_suggestions(query)
+        except SuggestionsBusy:
+            PLAY_SUGGEST_REQUESTS.labels(result="busy").inc()
+            results = prefix_suggestions(query)
+        except Exception as e:
+            PLAY_SUGGEST_REQUESTS.labels(result="error").inc()
+            logger.warning("Play autocomplete search failed", error=str(e))
+            results = []
+    if _suggest_latest.get(user_id) == interaction.id:
+        _suggest_latest.pop(user_id, None)
+    await interaction.response.send_autocomplete(suggestion_choices(results))
+
+
+# Playlist search: an inverted index from tokens of each entry's title, uploader and adder to
+# the entry's position in playlist.json. The playlist is append-only, so the index follows the
+# store by indexing the new tail whenever the document version moves, and addsong feeds its own
+# entry in directly.
+SEARCH_TOKEN_RE = re.compile(r"\w+")
+PLAYLIST_FIELD_WEIGHTS = {"title": 3.0, "uploader": 2.0, "added_by_name": 1.0}
+PLAYLIST_PREFIX_EXPANSIONS = 32
+PLAYLIST_MAX_POSTINGS = 5000
+PLAYLIST_SEARCH_LATENCY = Histogram('playlist_search_seconds', 'Playlist index query time',
+                                    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+
+def search_tokens(text: str) -> List[str]:
+    return SEARCH_TOKEN_RE.findall(text.casefold())
+
+
+def playlist_entry(link: str, info: Dict[str, Any], user: nextcord.abc.User) -> Dict[str, Any]:
+    return {
+        "link": link,
+        "title": info.get("title"),
+        "uploader": info.get("uploader"),
+        "added_by": user.id,
+        "added_by_name": getattr(user, "display_name", None) or user.name,
+        "ts": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class PlaylistIndex:
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.labels: List[str] = []
+        self.links: List[str] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.terms: List[str] = []  # sorted, for prefix lookups
+        self._lock = asyncio.Lock()
+
+    def _index(self, entries: List[Dict[str, Any]]) -> None:
+        new_terms = []
+        for entry in entries:
+            pos = len(self.labels)
+            self.labels.append(entry.get("title") or entry.get("link") or "")
+            self.links.append(entry.get("link") or "")
+            for field, weight in PLAYLIST_FIELD_WEIGHTS.items():
+                for token in search_tokens(str(entry.get(field) or "")):
+                    postings = self.postings.get(token)
+                    if postings is None:
+                        postings = self.postings[token] = {}
+                        new_terms.append(token)
+                    postings[pos] = max(postings.get(pos, 0.0), weight)
+        if len(new_terms) > 64:
+            self.terms = sorted(self.postings)
         else:
-            vc = await channel.connect()
-        if vc.is_playing():
-            vc.stop()
-        source = nextcord.FFmpegPCMAudio(url)
-        vc.play(source)
-        embed = nextcord.Embed(
-            title="🎵 Now Playing",
-            description=f"[{info.get('title', 'Unknown')}]({link})\n\n💬 'Music is the strongest form of magic.' - Marilyn Manson 🎸",
-            color=0x00FF00
-        )
-        embed.add_field(name="Author", value=info.get('uploader', 'Unknown'), inline=True)
-        embed.add_field(name="Duration", value=f"{info.get('duration', 0)}s", inline=True)
-        if info.get('thumbnail'):
-            embed.set_thumbnail(url=info.get('thumbnail'))
-        view = MusicControls(vc)
-        await interaction.followup.send(embed=embed, view=view, ephemeral=True)
-    except Exception as e:
-        await interaction.followup.send(f"🎼 Oops! Something went wrong with playback: {e}. 'Music is my religion.' - Jimi Hendrix 🎶", ephemeral=True)
+            for token in new_terms:
+                bisect.insort(self.terms, token)
+
+    def rebuild(self, entries: List[Dict[str, Any]]) -> None:
+        self.labels, self.links, self.postings, self.terms = [], [], {}, []
+        self._index(entries)
+
+    def _refresh(self) -> None:
+        version = document_version(PLAYLIST_FILE)
+        if version == self.version:
+            return
+        data = read_json(PLAYLIST_FILE, [])
+        with span("playlist_index.refresh", entries=len(data) - len(self.labels)):
+            if len(data) < len(self.labels):
+                self.rebuild(data)
+            else:
+                self._index(data[len(self.labels):])
+        self.version = version
+
+    async def refresh(self) -> None:
+        """Catch up with the store (off the event loop)"""
+        async with self._lock:
+            await asyncio.to_thread(self._refresh)
+
+    def appended(self, data: List[Dict[str, Any]]) -> None:
+        """Index the entry just appended by this process, if the index was current before it"""
+        if not self._lock.locked() and len(self.labels) == len(data) - 1:
+            self._index(data[-1:])
+            self.version = document_version(PLAYLIST_FILE)
+
+    def _terms(self, token: str, exact_only: bool) -> List[tuple]:
+        """(term, idf) for `token` itself or, unless exact_only, every indexed word starting with it"""
+        n = len(self.labels)
+        terms = [token]
+        if not exact_only:
+            start = bisect.bisect_left(self.terms, token)
+            terms = []
+            for term in itertools.islice(self.terms, start, start + PLAYLIST_PREFIX_EXPANSIONS):
+                if not term.startswith(token):
+                    break
+                terms.append(term)
+        return [(term, math.log(1 + n / len(self.postings[term])) * (1.0 if term == token else 0.7))
+                for term in terms if self.postings.get(term)]
+
+    def search(self, query: str, limit: int = 10) -> List[tuple]:
+        """(position, label, link) of entries matching every query word, best first; the last
+        word may be a prefix so the query works while it is being typed"""
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        with PLAYLIST_SEARCH_LATENCY.time():
+            per_token = [self._terms(t, exact_only=i < len(tokens) - 1) for i, t in enumerate(tokens)]
+            if not all(per_token):
+                return []
+            per_token.sort(key=lambda terms: sum(len(self.postings[t]) for t, _ in terms))
+            # Candidates come from the rarest word. A very common word (or short prefix) only
+            # contributes its newest PLAYLIST_MAX_POSTINGS entries, which also win score ties.
+            scores: Dict[int, float] = {}
+            budget = PLAYLIST_MAX_POSTINGS
+            for term, idf in per_token[0]:
+                postings = self.postings[term]
+                for pos in itertools.islice(reversed(postings), budget):
+                    score = postings[pos] * idf
+                    if score > scores.get(pos, 0.0):
+                        scores[pos] = score
+                budget -= len(postings)
+                if budget <= 0:
+                    break
+            for terms in per_token[1:]:
+                lookups = [(self.postings[t], idf) for t, idf in terms]
+                narrowed: Dict[int, float] = {}
+                for pos, score in scores.items():
+                    extra = max(postings.get(pos, 0.0) * idf for postings, idf in lookups)
+                    if extra:
+                        narrowed[pos] = score + extra
+                scores = narrowed
+                if not scores:
+                    return []
+            best = heapq.nlargest(limit, scores, key=lambda pos: (scores[pos], pos))
+        return [(pos, self.labels[pos], self.links[pos]) for pos in best]
+
+
+playlist_index = PlaylistIndex()
+
+
+async def search_playlist(query: str, limit: int = 10) -> List[tuple]:
+    """Catch up with the store, then search; both run off the event loop under the index lock"""
+    async with playlist_index._lock:
+        await asyncio.to_thread(playlist_index._refresh)
+        return await asyncio.to_thread(playlist_index.search, query, limit)
+
+
+def playlist_search_embed(query: str, results: List[tuple]) -> nextcord.Embed:
+    lines = []
+    for pos, label, link in results:
+        name = f"[{label}]({link})" if link.startswith(("http://", "https://")) and label != link else label
+        lines.append(f"{pos + 1}. {name}")
+    return nextcord.Embed(title=f"Playlist results for \"{query}\"", description="\n".join(lines), color=0x03A9F4)
+
 
 @bot.command(name="playlist")
-async def cmd_playlist(ctx: commands.Context):
-    data = read_json(PLAYLIST_FILE, [])
-    if not data:
+async def cmd_playlist(ctx: commands.Context, subcmd: Optional[str] = None, *, query: Optional[str] = None):
+    if subcmd == "search":
+        if not query:
+            await ctx.send("Usage: !playlist search [words]")
+            return
+        results = await search_playlist(query)
+        if not results:
+            await ctx.send("No playlist entries match that.")
+            return
+        await ctx.send(embed=playlist_search_embed(query, results))
+        return
+    embed = playlist_page_embed()
+    if not embed:
         await ctx.send("Community playlist is empty.")
         return
-    lines = []
-    for i, item in enumerate(data[:10], start=1):
-        lines.append(f"{i}. {item.get('title') or item.get('link')}")
-    embed = nextcord.Embed(
-        title="Community Playlist",
-        description="\n".join(lines),
-        color=0x03A9F4,
-    )
     await ctx.send(embed=embed)
 
 @bot.command(name="sources")
@@ -1005,50 +3844,61 @@ async def cmd_addsong(ctx: commands.Context, link: Optional[str] = None):
     if not is_allowed_music_link(link):
         await ctx.send("Link must be from allowed free sources (YouTube, SoundCloud, FMA, Jamendo, ccMixter).")
         return
-    title = None
-    try:
-        import yt_dlp
-        ydl_opts = {"quiet": True, "nocheckcertificate": True, "noplaylist": True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(link, download=False)
-            title = info.get("title")
-    except Exception:
-        pass
-    data = read_json(PLAYLIST_FILE, [])
-    data.append({"link": link, "title": title, "added_by": ctx.author.id, "ts": datetime.now(timezone.utc).isoformat()})
-    write_json(PLAYLIST_FILE, data)
+    lease = await admit_context(ctx, "addsong")
+    if lease is None:
+        return
+    info: Dict[str, Any] = {}
+    with lease:
+        try:
+            ydl_opts = {"quiet": True, "nocheckcertificate": True, "noplaylist": True}
+            info = await run_extraction(extract_info, link, ydl_opts)
+        except Exception:
+            pass
+    entry = playlist_entry(link, info, ctx.author)
+    playlist_index.appended(update_json(PLAYLIST_FILE, [], lambda data: data + [entry]))
     await ctx.send("Added to community playlist.")
 
 @bot.slash_command(name="playlist", description="Show community playlist")
 async def slash_playlist(interaction: nextcord.Interaction):
-    data = read_json(PLAYLIST_FILE, [])
-    if not data:
+    embed = playlist_page_embed()
+    if not embed:
         await interaction.response.send_message("Community playlist is empty.", ephemeral=True)
         return
-    lines = []
-    for i, item in enumerate(data[:10], start=1):
-        lines.append(f"{i}. {item.get('title') or item.get('link')}")
-    embed = nextcord.Embed(title="Community Playlist", description="\n".join(lines), color=0x03A9F4)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@bot.slash_command(name="playlist_search", description="Search the community playlist by title, uploader or who added it")
+async def slash_playlist_search(interaction: nextcord.Interaction, query: str):
+    results = await search_playlist(query)
+    if not results:
+        await interaction.response.send_message("No playlist entries match that.", ephemeral=True)
+        return
+    await interaction.response.send_message(embed=playlist_search_embed(query, results), ephemeral=True)
+
+
+@slash_playlist_search.on_autocomplete("query")
+async def autocomplete_playlist_search(interaction: nextcord.Interaction, query: str):
+    results = await search_playlist(query, limit=25) if query else []
+    labels = list(dict.fromkeys(label[:100] for _, label, _ in results if label))
+    await interaction.response.send_autocomplete(labels)
+
 @bot.slash_command(name="addsong", description="Add song link to community playlist")
 async def slash_addsong(interaction: nextcord.Interaction, link: str):
     if not is_allowed_music_link(link):
         await interaction.response.send_message("Link must be from allowed free sources.", ephemeral=True)
         return
-    title = None
-    try:
-        import yt_dlp
-        ydl_opts = {"quiet": True, "nocheckcertificate": True, "noplaylist": True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(link, download=False)
-            title = info.get("title")
-    except Exception:
-        pass
-    data = read_json(PLAYLIST_FILE, [])
-    data.append({"link": link, "title": title, "added_by": interaction.user.id, "ts": datetime.now(timezone.utc).isoformat()})
-    write_json(PLAYLIST_FILE, data)
-    await interaction.response.send_message("Added to community playlist.", ephemeral=True)
+    lease = await admit_interaction(interaction, "addsong")
+    if lease is None:
+        return
+    info: Dict[str, Any] = {}
+    with lease:
+        try:
+            ydl_opts = {"quiet": True, "nocheckcertificate": True, "noplaylist": True}
+            info = await run_extraction(extract_info, link, ydl_opts)
+        except Exception:
+            pass
+    entry = playlist_entry(link, info, interaction.user)
+    playlist_index.appended(update_json(PLAYLIST_FILE, [], lambda data: data + [entry]))
+    await interaction.followup.send("Added to community playlist.", ephemeral=True)
 @bot.command(name="stop")
 async def cmd_stop(ctx: commands.Context):
     vc: Optional[nextcord.VoiceClient] = ctx.guild.voice_client
@@ -1085,69 +3935,65 @@ async def slash_skip(interaction: nextcord.Interaction):
         return
     await interaction.response.send_message("🎵 Nothing is playing at the moment. 'Music is the wine that fills the cup of silence.' - Robert Fripp 🍷", ephemeral=True)
 
+@bot.command(name="nowplaying")
+async def cmd_nowplaying(ctx: commands.Context):
+    embed = now_playing_embed(ctx.guild.id) if ctx.guild else None
+    if not embed:
+        await ctx.send("Nothing is playing.")
+        return
+    await ctx.send(embed=embed)
+
+@bot.slash_command(name="nowplaying", description="Show the current track and its startup timings")
+async def slash_nowplaying(interaction: nextcord.Interaction):
+    embed = now_playing_embed(interaction.guild.id) if interaction.guild else None
+    if not embed:
+        await interaction.response.send_message("🎵 Nothing is playing at the moment.", ephemeral=True)
+        return
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.command(name="banner")
 @commands.cooldown(1, 10, commands.BucketType.user)
 async def cmd_banner(ctx: commands.Context, action: Optional[str] = None, link: Optional[str] = None):
     if action != "set" or not link:
         await ctx.send("Usage: !banner set [link]")
         return
+    lease = await admit_context(ctx, "banner")
+    if lease is None:
+        return
     try:
-        import requests
-        if not link.lower().startswith(("http://", "https://")):
-            await ctx.send("Invalid link. Use http/https URLs only.")
-            return
-        resp = requests.get(link, timeout=10)
-        if resp.status_code != 200 or not resp.content:
-            await ctx.send("Failed to download banner.")
-            return
-        filename = f"{ctx.author.id}_banner.png"
-        fpath = os.path.join(BANNERS_DIR, filename)
-        with open(fpath, "wb") as f:
-            f.write(resp.content)
-        prof = load_profile(ctx.author.id)
-        prof["banner_file"] = fpath
-        save_profile(ctx.author.id, prof)
+        with lease:
+            await set_banner(ctx.author.id, link)
         await ctx.send("Banner updated.")
+    except BannerError as e:
+        await ctx.send(str(e))
     except Exception as e:
         await ctx.send(f"Error: {e}")
 
 @bot.slash_command(name="banner_set", description="Set banner image from URL")
 async def slash_banner_set(interaction: nextcord.Interaction, link: str):
+    lease = await admit_interaction(interaction, "banner")
+    if lease is None:
+        return
     try:
-        import requests
-        if not link.lower().startswith(("http://", "https://")):
-            await interaction.response.send_message("Invalid link. Use http/https URLs only.", ephemeral=True)
-            return
-        resp = requests.get(link, timeout=10)
-        if resp.status_code != 200 or not resp.content:
-            await interaction.response.send_message("Failed to download banner.", ephemeral=True)
-            return
-        filename = f"{interaction.user.id}_banner.png"
-        fpath = os.path.join(BANNERS_DIR, filename)
-        with open(fpath, "wb") as f:
-            f.write(resp.content)
-        prof = load_profile(interaction.user.id)
-        prof["banner_file"] = fpath
-        save_profile(interaction.user.id, prof)
-        await interaction.response.send_message("Banner updated.", ephemeral=True)
+        with lease:
+            await set_banner(interaction.user.id, link)
+        await interaction.followup.send("Banner updated.", ephemeral=True)
+    except BannerError as e:
+        await interaction.followup.send(str(e), ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(f"Error: {e}", ephemeral=True)
+        await interaction.followup.send(f"Error: {e}", ephemeral=True)
 
 @bot.command(name="status")
 async def cmd_status(ctx: commands.Context, *, text: Optional[str] = None):
     if not text:
         await ctx.send("Usage: !status [text]")
         return
-    prof = load_profile(ctx.author.id)
-    prof["status_text"] = text.strip()[:200]
-    save_profile(ctx.author.id, prof)
+    set_profile_fields(ctx.author.id, status_text=text.strip()[:200])
     await ctx.send("Bot-only status updated.")
 
 @bot.slash_command(name="status", description="Set bot-only status text")
 async def slash_status(interaction: nextcord.Interaction, text: str):
-    prof = load_profile(interaction.user.id)
-    prof["status_text"] = text.strip()[:200]
-    save_profile(interaction.user.id, prof)
+    set_profile_fields(interaction.user.id, status_text=text.strip()[:200])
     await interaction.response.send_message("Bot-only status updated.", ephemeral=True)
 @bot.command(name="quote")
 @commands.cooldown(1, 5, commands.BucketType.user)
@@ -1155,16 +4001,12 @@ async def cmd_quote(ctx: commands.Context, *, text: Optional[str] = None):
     if not text:
         await ctx.send("Usage: !quote [text]")
         return
-    prof = load_profile(ctx.author.id)
-    prof["quote"] = text.strip()[:200]
-    save_profile(ctx.author.id, prof)
+    set_profile_fields(ctx.author.id, quote=text.strip()[:200])
     await ctx.send("Quote updated.")
 
 @bot.slash_command(name="quote", description="Set personal/anime quote")
 async def slash_quote(interaction: nextcord.Interaction, text: str):
-    prof = load_profile(interaction.user.id)
-    prof["quote"] = text.strip()[:200]
-    save_profile(interaction.user.id, prof)
+    set_profile_fields(interaction.user.id, quote=text.strip()[:200])
     await interaction.response.send_message("Quote updated.", ephemeral=True)
 @bot.command(name="ping")
 async def cmd_ping(ctx: commands.Context):
@@ -1201,65 +4043,39 @@ def is_admin_member(member: nextcord.abc.User) -> bool:
     except Exception:
         return False
 
-class KanziView(nextcord.ui.View):
-    def __init__(self, requester: nextcord.Member):
-        super().__init__(timeout=120)
-        self.requester = requester
+class KanziView(PersistentView):
+    # Every button acts on the presser's own profile and answers ephemerally, so the panel
+    # does not need to remember who opened it.
 
-    @nextcord.ui.button(label="Theme Toggle", style=nextcord.ButtonStyle.primary)
+    @nextcord.ui.button(label="Theme Toggle", style=nextcord.ButtonStyle.primary, custom_id="kanzi:panel:theme")
     async def toggle_theme(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        if interaction.user.id != self.requester.id:
-            await interaction.response.send_message("This panel is bound to another user.", ephemeral=True)
-            return
         ctx_author = interaction.user
         if not (has_premium(ctx_author.id) or is_admin_member(ctx_author) or is_owner_member(ctx_author)):
             await interaction.response.send_message("Premium required. Earn by listening 3h or get admin grant.", ephemeral=True)
             return
-        prof = load_profile(ctx_author.id)
-        prof["theme"] = ANIME_THEME if (prof.get("theme") != ANIME_THEME) else NEUTRAL_THEME
-        save_profile(ctx_author.id, prof)
+        prof = update_profile(ctx_author.id, flip_theme)
         await interaction.response.send_message(f"Toggled theme to {prof['theme']}", ephemeral=True)
 
-    @nextcord.ui.button(label="Anime Rec", style=nextcord.ButtonStyle.success)
+    @nextcord.ui.button(label="Anime Rec", style=nextcord.ButtonStyle.success, custom_id="kanzi:panel:anime_rec")
     async def anime_rec_btn(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        if interaction.user.id != self.requester.id:
-            await interaction.response.send_message("This panel is bound to another user.", ephemeral=True)
-            return
         ctx_author = interaction.user
         if not (has_premium(ctx_author.id) or is_admin_member(ctx_author) or is_owner_member(ctx_author)):
             await interaction.response.send_message("Premium required.", ephemeral=True)
             return
         prof = load_profile(ctx_author.id)
         theme = prof.get("theme") or ANIME_THEME
-        recs = [
-            "Fullmetal Alchemist: Brotherhood",
-            "Attack on Titan",
-            "Cyberpunk: Edgerunners",
-            "Your Name",
-            "Jujutsu Kaisen",
-        ] if theme == ANIME_THEME else [
-            "Violet Evergarden",
-            "Mushishi",
-            "Barakamon",
-            "A Silent Voice",
-            "Made in Abyss",
-        ]
-        embed = nextcord.Embed(title="Anime Recommendations", description="\n".join(f"• {r}" for r in recs), color=0xE91E63)
+        embed = await anime_recommendations_embed(ctx_author.id, theme)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    @nextcord.ui.button(label="Playlist", style=nextcord.ButtonStyle.secondary)
+    @nextcord.ui.button(label="Playlist", style=nextcord.ButtonStyle.secondary, custom_id="kanzi:panel:playlist")
     async def playlist_btn(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
-        data = read_json(PLAYLIST_FILE, [])
-        if not data:
+        embed = playlist_page_embed()
+        if not embed:
             await interaction.response.send_message("Playlist is empty.", ephemeral=True)
             return
-        lines = []
-        for i, item in enumerate(data[:10], start=1):
-            lines.append(f"{i}. {item.get('title') or item.get('link')}")
-        embed = nextcord.Embed(title="Community Playlist", description="\n".join(lines), color=0x03A9F4)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    @nextcord.ui.button(label="Listening Status", style=nextcord.ButtonStyle.blurple)
+    @nextcord.ui.button(label="Listening Status", style=nextcord.ButtonStyle.blurple, custom_id="kanzi:panel:listening")
     async def listen_btn(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
         total_seconds = int(listening_stats().get(str(interaction.user.id), 0))
         await interaction.response.send_message(f"{human_time(total_seconds)}/{human_time(REWARD_LISTEN_SECONDS_REQUIRED)}", ephemeral=True)
@@ -1270,10 +4086,10 @@ def build_help_embed() -> nextcord.Embed:
     lines.append("• Theme: /theme_status, /theme_set, /theme_toggle")
     lines.append("• Premium: /premium_status, /premium_grant, /premium_revoke, /owner_override")
     lines.append("• Admin: /admin_add, /admin_remove, /ownerset")
-    lines.append("• Music: /playlocal, /play, /addsong, /playlist, /skip, /stop, /listen_status, /sources")
+    lines.append("• Music: /playlocal, /play, /nowplaying, /addsong, /playlist, /skip, /stop, /listen_status, /sources")
     lines.append("• Fun: /anime_search, /game_search, /joke, /meme, /nature_fact, /roll_dice, /spotify_search, /artist_info")
     lines.append("• Anime: /anime_rec")
-    lines.append("• Utility: /ping, /help, /leaderboard")
+    lines.append("• Utility: /ping, /help, /leaderboard [day/week/month]")
     lines.append("• Sources: youtube.com, youtu.be, soundcloud.com, freemusicarchive.org, jamendo.com, ccmixter.org")
     embed = make_embed("Kanzi Bot • Help", "\n".join(lines), bot.user, False, ANIME_THEME)
     embed.set_image(url="https://via.placeholder.com/800x200/FF69B4/FFFFFF?text=Kanzi+Bot+Help")
@@ -1284,93 +4100,87 @@ def build_help_embed() -> nextcord.Embed:
     embed.add_field(name="Storage", value="Local project folder: data/ - All your data is safe with us! 🔒", inline=False)
     return embed
 
+
+def help_embed() -> nextcord.Embed:
+    return embed_templates.get("help", None, 0, build_help_embed)
+
+
+def warm_embed_templates() -> None:
+    """Build the static panels once so the first /help or anime rec is a cache hit"""
+    help_embed()
+    for theme in ANIME_RECS:
+        anime_recs_embed(theme)
+
 @bot.command(name="help")
 async def cmd_help(ctx: commands.Context):
-    embed = build_help_embed()
-    view = KanziView(ctx.author)
-    await ctx.send(embed=embed, view=view)
+    embed = help_embed()
+    view = KanziView.shared()
+    untrack_panel_message(await ctx.send(embed=embed, view=view))
 
 @bot.slash_command(name="help", description="Show help panel")
 async def slash_help(interaction: nextcord.Interaction):
-    embed = build_help_embed()
-    view = KanziView(interaction.user)
+    embed = help_embed()
+    view = KanziView.shared()
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+async def leaderboard_embed(guild: Optional[nextcord.Guild], period: str) -> nextcord.Embed:
+    """Leaderboard page, rebuilt only when listening totals (and with them the history) change"""
+    async def build() -> nextcord.Embed:
+        top = top_listeners(guild, period)
+        names = await resolve_member_names(guild, [uid for uid, _ in top]) if guild else {}
+        lines = [f"{i}. {names.get(uid, f'<@{uid}>')} — {human_time(sec)}" for i, (uid, sec) in enumerate(top, start=1)]
+        return nextcord.Embed(title=LEADERBOARD_TITLES[period], description="\n".join(lines) or "No data", color=0x8BC34A)
+    key = (guild.id if guild else None, period)
+    # Day/week/month pages also roll over at midnight UTC without any write
+    version = (document_version(LISTENING_FILE), epoch_day())
+    return await embed_templates.aget("leaderboard_page", key, version, build)
+
+
 @bot.command(name="leaderboard")
-async def cmd_leaderboard(ctx: commands.Context):
-    stats = listening_stats()
-    items = [(int(uid), int(sec)) for uid, sec in stats.items()]
-    items.sort(key=lambda x: x[1], reverse=True)
-    top = items[:10]
-    lines = []
-    for i, (uid, sec) in enumerate(top, start=1):
-        member = ctx.guild.get_member(uid)
-        name = member.display_name if member else str(uid)
-        lines.append(f"{i}. {name} — {human_time(sec)}")
-    embed = nextcord.Embed(title="Top Listeners", description="\n".join(lines) or "No data", color=0x8BC34A)
+async def cmd_leaderboard(ctx: commands.Context, period: str = "all"):
+    if period not in LEADERBOARD_PERIODS:
+        await ctx.send("Usage: !leaderboard [all|day|week|month]")
+        return
+    embed = await leaderboard_embed(ctx.guild, period)
     await ctx.send(embed=embed)
 
 @bot.slash_command(name="leaderboard", description="Show top listeners")
-async def slash_leaderboard(interaction: nextcord.Interaction):
-    stats = listening_stats()
-    items = [(int(uid), int(sec)) for uid, sec in stats.items()]
-    items.sort(key=lambda x: x[1], reverse=True)
-    top = items[:10]
-    lines = []
-    for i, (uid, sec) in enumerate(top, start=1):
-        member = interaction.guild.get_member(uid) if interaction.guild else None
-        name = member.display_name if member else str(uid)
-        lines.append(f"{i}. {name} — {human_time(sec)}")
-    embed = nextcord.Embed(title="Top Listeners", description="\n".join(lines) or "No data", color=0x8BC34A)
+async def slash_leaderboard(
+    interaction: nextcord.Interaction,
+    period: str = nextcord.SlashOption(name="period", description="all, day, week or month", choices=list(LEADERBOARD_PERIODS), default="all", required=False),
+):
+    if period not in LEADERBOARD_PERIODS:
+        await interaction.response.send_message("Period must be one of: all, day, week, month.", ephemeral=True)
+        return
+    embed = await leaderboard_embed(interaction.guild, period)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 @bot.command(name="anime")
 @commands.cooldown(1, 5, commands.BucketType.user)
-async def cmd_anime(ctx: commands.Context, subcmd: Optional[str] = None):
+async def cmd_anime(ctx: commands.Context, subcmd: Optional[str] = None, *, like: Optional[str] = None):
     if subcmd != "rec":
-        await ctx.send("Usage: !anime rec")
+        await ctx.send("Usage: !anime rec [title]")
         return
     if not await require_premium(ctx):
         return
     prof = load_profile(ctx.author.id)
     theme = prof.get("theme") or ANIME_THEME
-    recs = [
-        "Fullmetal Alchemist: Brotherhood",
-        "Attack on Titan",
-        "Cyberpunk: Edgerunners",
-        "Your Name",
-        "Jujutsu Kaisen",
-    ] if theme == ANIME_THEME else [
-        "Violet Evergarden",
-        "Mushishi",
-        "Barakamon",
-        "A Silent Voice",
-        "Made in Abyss",
-    ]
-    embed = nextcord.Embed(title="Anime Recommendations", description="\n".join(f"• {r}" for r in recs), color=0xE91E63)
+    embed = await anime_recommendations_embed(ctx.author.id, theme, like)
     await ctx.send(embed=embed)
 
-@bot.slash_command(name="anime_rec", description="Anime recommendations (premium)")
-async def slash_anime_rec(interaction: nextcord.Interaction):
+@bot.slash_command(name="anime_rec", description="Anime recommendations (premium), optionally like a given title")
+async def slash_anime_rec(interaction: nextcord.Interaction, like: Optional[str] = None):
     user = interaction.user
     if not (has_premium(user.id) or is_admin_member(user) or is_owner_member(user)):
         await interaction.response.send_message("Premium required.", ephemeral=True)
         return
     prof = load_profile(user.id)
     theme = prof.get("theme") or ANIME_THEME
-    recs = [
-        "Fullmetal Alchemist: Brotherhood",
-        "Attack on Titan",
-        "Cyberpunk: Edgerunners",
-        "Your Name",
-        "Jujutsu Kaisen",
-    ] if theme == ANIME_THEME else [
-        "Violet Evergarden",
-        "Mushishi",
-        "Barakamon",
-        "A Silent Voice",
-        "Made in Abyss",
-    ]
-    embed = nextcord.Embed(title="Anime Recommendations", description="\n".join(f"• {r}" for r in recs), color=0xE91E63)
+    if like:
+        await interaction.response.defer(ephemeral=True)
+        embed = await anime_recommendations_embed(user.id, theme, like)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    embed = await anime_recommendations_embed(user.id, theme)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 @bot.command(name="admin")
 async def cmd_admin(ctx: commands.Context, action: Optional[str] = None, user: Optional[nextcord.Member] = None):
@@ -1383,15 +4193,11 @@ async def cmd_admin(ctx: commands.Context, action: Optional[str] = None, user: O
     if not user:
         await ctx.send("Please mention a user.")
         return
-    cfg = read_json(ADMIN_FILE, {"admins": []})
-    admins = set(cfg.get("admins") or [])
+    set_admin(user.id, action == "add")
     if action == "add":
-        admins.add(user.id)
         await ctx.send(f"Admin added: {user.mention}")
     else:
-        admins.discard(user.id)
         await ctx.send(f"Admin removed: {user.mention}")
-    write_json(ADMIN_FILE, {"admins": list(admins)})
 
 @bot.command(name="ownerset")
 async def cmd_owner_set(ctx: commands.Context, user: Optional[nextcord.Member] = None):
@@ -1409,10 +4215,7 @@ async def slash_admin_add(interaction: nextcord.Interaction, user: nextcord.Memb
     if not is_owner_member(interaction.user):
         await interaction.response.send_message("Only owner can add admins.", ephemeral=True)
         return
-    cfg = read_json(ADMIN_FILE, {"admins": []})
-    admins = set(cfg.get("admins") or [])
-    admins.add(user.id)
-    write_json(ADMIN_FILE, {"admins": list(admins)})
+    set_admin(user.id, True)
     await interaction.response.send_message(f"Admin added: {user.mention}", ephemeral=True)
 
 @bot.slash_command(name="admin_remove", description="Owner removes admin by mention")
@@ -1420,10 +4223,7 @@ async def slash_admin_remove(interaction: nextcord.Interaction, user: nextcord.M
     if not is_owner_member(interaction.user):
         await interaction.response.send_message("Only owner can remove admins.", ephemeral=True)
         return
-    cfg = read_json(ADMIN_FILE, {"admins": []})
-    admins = set(cfg.get("admins") or [])
-    admins.discard(user.id)
-    write_json(ADMIN_FILE, {"admins": list(admins)})
+    set_admin(user.id, False)
     await interaction.response.send_message(f"Admin removed: {user.mention}", ephemeral=True)
 
 @bot.slash_command(name="ownerset", description="Owner sets a new owner by mention")
@@ -1439,6 +4239,8 @@ async def slash_ownerset(interaction: nextcord.Interaction, user: nextcord.Membe
 async def slash_anime_search(interaction: nextcord.Interaction, query: str):
     await interaction.response.defer()
     data = await fetch_anime_info(query)
+    if data.get("mal_id"):
+        remember_anime_search(interaction.user.id, int(data["mal_id"]))
     if not data:
         embed = nextcord.Embed(title="Anime Not Found", description="Sorry, I couldn't find that anime!", color=0xFF5722)
     else:
@@ -1456,8 +4258,11 @@ async def slash_anime_search(interaction: nextcord.Interaction, query: str):
 
 @bot.slash_command(name="game_search", description="Search for game information")
 async def slash_game_search(interaction: nextcord.Interaction, query: str):
-    await interaction.response.defer()
-    data = await fetch_game_info(query)
+    lease = await admit_interaction(interaction, "search", ephemeral=False)
+    if lease is None:
+        return
+    with lease:
+        data = await fetch_game_info(query)
     if not data:
         embed = nextcord.Embed(title="Game Not Found", description="Sorry, I couldn't find that game!", color=0xFF5722)
     else:
@@ -1540,9 +4345,137 @@ async def slash_artist_info(interaction: nextcord.Interaction, artist: str):
             embed.set_thumbnail(url=info['strArtistThumb'])
     await interaction.followup.send(embed=embed)
 
+# Lifecycle: on SIGTERM/SIGINT stop admitting heavy commands, let running ones finish, credit
+# open listening sessions, snapshot what every guild is playing and close cleanly. The next
+# start resumes the snapshot from the saved position in all guilds at once.
+PLAYBACK_SNAPSHOT_FILE = os.path.join(DATA_ROOT, f"playback-{CLUSTER_ID}.json" if CLUSTER_ID else "playback.json")
+SHUTDOWN_GRACE = float(os.getenv("KANZI_SHUTDOWN_GRACE_SECONDS", "10"))
+RESTORE_MAX_AGE = float(os.getenv("KANZI_RESTORE_MAX_AGE_SECONDS", "900"))
+PLAYBACK_RESTORES = Counter('playback_restores_total', 'Playback sessions resumed after a restart', ['result'])
+
+shutdown_started = False
+shutdown_task: Optional[asyncio.Task] = None
+restore_task: Optional[asyncio.Task] = None
+
+
+def playback_snapshot() -> List[Dict[str, Any]]:
+    guilds = []
+    for guild_id, entry in list(NOW_PLAYING.items()):
+        guild = bot.get_guild(guild_id)
+        vc = guild.voice_client if guild else None
+        if not vc or not vc.is_connected():
+            continue
+        guilds.append({
+            "guild_id": guild_id,
+            "channel_id": vc.channel.id,
+            "title": entry["title"],
+            "link": entry["link"],
+            "kind": entry["kind"],
+            "requested_by": entry["requested_by"],
+            "position": round(entry["source"].position, 2),
+            "paused": vc.is_paused(),
+        })
+    return guilds
+
+
+async def shutdown(reason: str) -> None:
+    """Drain, persist and close; safe to trigger more than once"""
+    global shutdown_started
+    if shutdown_started:
+        return
+    shutdown_started = True
+    started = time.perf_counter()
+    logger.info("Shutting down", reason=reason)
+    admission.close()
+    drained = await admission.drain(SHUTDOWN_GRACE)
+
+    snapshot = playback_snapshot()
+    write_json(PLAYBACK_SNAPSHOT_FILE, {"saved_at": time.time(), "guilds": snapshot})
+
+    now = time.monotonic()
+    for gid, sessions in list(listening_sessions.items()):
+        bank_credits(gid, close_sessions(gid, list(sessions), now))
+    LISTENING_SESSIONS_OPEN.set(0)
+    for loop_task in (start_listening_tracker, sample_ffmpeg_usage, sample_gateway_memory):
+        loop_task.cancel()
+    await asyncio.to_thread(checkpoint_listening, take_closed_credits())
+    await anime_index.flush()
+
+    async def leave(vc: nextcord.VoiceClient) -> None:
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(vc.disconnect(force=True), 5)
+
+    await asyncio.gather(*(leave(vc) for vc in list(bot.voice_clients)))
+    logger.info("Shutdown state saved", drained=drained, playback=len(snapshot), seconds=round(time.perf_counter() - started, 3))
+    await bot.close()
+    cache.close()
+
+
+def request_shutdown(reason: str) -> None:
+    """Signal handler; runs shutdown() on the bot loop"""
+    global shutdown_task
+    if shutdown_task is None:
+        shutdown_task = bot.loop.create_task(shutdown(reason))
+
+
+async def restore_guild_playback(item: Dict[str, Any]) -> str:
+    guild = bot.get_guild(item["guild_id"])
+    channel = guild.get_channel(item["channel_id"]) if guild else None
+    if not isinstance(channel, nextcord.VoiceChannel) or not any(not m.bot for m in channel.members):
+        return "skipped"
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    link = item["link"]
+    if item["kind"] == "local":
+        if not os.path.exists(link):
+            return "skipped"
+        stream = link
+    else:
+        # Stream URLs expire; resolve the page link again
+        with voice_stage("resolve", timings):
+            info = await run_extraction(auto_solve_playback, link)
+        stream = info["url"]
+    vc = await connect_voice(guild, channel, timings)
+    start_playback(vc, stream, title=item["title"], link=link, kind=item["kind"], requested_by=item["requested_by"],
+                   command="restore", started=started, timings=timings, seek=item.get("position") or 0.0)
+    if item.get("paused"):
+        vc.pause()
+        refresh_listening_sessions(guild)
+    return "resumed"
+
+
+async def restore_playback() -> None:
+    """Resume the sessions saved by the last shutdown, concurrently"""
+    state = read_json(PLAYBACK_SNAPSHOT_FILE, {})
+    items = state.get("guilds") or []
+    if not items:
+        return
+    write_json(PLAYBACK_SNAPSHOT_FILE, {"saved_at": state.get("saved_at"), "guilds": []})
+    if time.time() - float(state.get("saved_at") or 0) > RESTORE_MAX_AGE:
+        PLAYBACK_RESTORES.labels(result="expired").inc(len(items))
+        return
+
+    async def one(item: Dict[str, Any]) -> str:
+        try:
+            result = await restore_guild_playback(item)
+        except Exception as e:
+            logger.warning("Playback restore failed", guild=item.get("guild_id"), error=str(e))
+            result = "failed"
+        PLAYBACK_RESTORES.labels(result=result).inc()
+        return result
+
+    with startup_phase("restore_playback"):
+        results = await asyncio.gather(*(one(item) for item in items))
+    logger.info("Playback restored", **collections.Counter(results))
+
+
 def run():
-    ensure_dirs()
-    load_env()
+    global _run_started
+    _run_started = time.perf_counter()
+    with startup_phase("dirs"):
+        ensure_dirs()
+    with startup_phase("env"):
+        load_env()
     global ALLOWED_MUSIC_DOMAINS
     doms = os.getenv("KANZI_ALLOWED_DOMAINS")
     if doms:
@@ -1551,7 +4484,23 @@ def run():
     if not token:
         print("Please set DISCORD_TOKEN environment variable with your bot token.")
         return
-    bot.run(token)
+    loop = bot.loop
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, request_shutdown, sig.name)
+    try:
+        loop.run_until_complete(bot.start(token))
+    finally:
+        if shutdown_task is not None:
+            loop.run_until_complete(shutdown_task)
+        if not bot.is_closed():
+            loop.run_until_complete(bot.close())
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
 
 
 @bot.slash_command(name="admin_send", description="Admin: Send a message through the bot")
@@ -1595,62 +4544,219 @@ async def slash_admin_give_role(interaction: nextcord.Interaction, member: nextc
         await interaction.response.send_message(f"❌ Failed to give role: {e}", ephemeral=True)
 
 
+PROFILE_MAX_SECONDS = 60
+PROFILE_SAMPLE_INTERVAL = 0.01
+# Sampler may use at most 1/PROFILE_OVERHEAD_RATIO of wall time; it backs off beyond that
+PROFILE_OVERHEAD_RATIO = 20
+
+profile_lock = asyncio.Lock()
+
+
+class StackSampler:
+    """Samples every thread's Python stack and aggregates them as collapsed stacks."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+
+    def run(self, seconds: float) -> collections.Counter:
+        me = threading.get_ident()
+        counts: collections.Counter = collections.Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            began = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+            spent = time.perf_counter() - began
+            time.sleep(max(self.interval, spent * PROFILE_OVERHEAD_RATIO))
+        return counts
+
+
+def dump_asyncio_tasks() -> str:
+    out = io.StringIO()
+    tasks_now = asyncio.all_tasks()
+    out.write(f"{len(tasks_now)} asyncio tasks\n\n")
+    for task in sorted(tasks_now, key=lambda t: t.get_name()):
+        state = "done" if task.done() else "pending"
+        out.write(f"{task.get_name()} [{state}] {task.get_coro()!r}\n")
+        task.print_stack(limit=25, file=out)
+        out.write("\n")
+    return out.getvalue()
+
+
+@bot.slash_command(name="admin_profile", description="Owner: sample all threads and return a flamegraph file")
+async def slash_admin_profile(
+    interaction: nextcord.Interaction,
+    seconds: int = nextcord.SlashOption(name="seconds", description="How long to sample", min_value=1, max_value=PROFILE_MAX_SECONDS, default=10),
+    task_dump: bool = nextcord.SlashOption(name="task_dump", description="Also attach an asyncio task dump", default=False),
+):
+    if not is_owner_member(interaction.user):
+        await interaction.response.send_message("❌ Only the owner can profile the bot.", ephemeral=True)
+        return
+    if profile_lock.locked():
+        await interaction.response.send_message("⏳ A profile is already running.", ephemeral=True)
+        return
+    async with profile_lock:
+        await interaction.response.defer(ephemeral=True)
+        sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+        counts = await asyncio.to_thread(sampler.run, seconds)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        folded = "\n".join(f"{stack} {n}" for stack, n in counts.most_common())
+        files = [nextcord.File(io.BytesIO(folded.encode("utf-8")), filename=f"kanzi-profile-{stamp}.folded")]
+        if task_dump:
+            files.append(nextcord.File(io.BytesIO(dump_asyncio_tasks().encode("utf-8")), filename=f"kanzi-tasks-{stamp}.txt"))
+        threads = len({stack.split(";", 1)[0] for stack in counts})
+        await interaction.followup.send(
+            f"🔥 Profiled {seconds}s: {sampler.samples} samples across {threads} threads. "
+            "Open the .folded file with speedscope or flamegraph.pl.",
+            files=files,
+            ephemeral=True,
+        )
+
+
 @bot.slash_command(name="ai_help", description="Ask AI for help or information")
 async def slash_ai_help(interaction: nextcord.Interaction, query: str):
-    if not openai.api_key:
+    if not openai_configured():
         await interaction.response.send_message("❌ OpenAI API key not set.", ephemeral=True)
         return
-    await interaction.response.defer(ephemeral=True)
+    lease = await admit_interaction(interaction, "ai")
+    if lease is None:
+        return
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": query}],
-            max_tokens=500
-        )
-        answer = response.choices[0].message.content.strip()
-        await interaction.followup.send(f"🤖 AI Help: {answer}", ephemeral=True)
+        reply = StreamingReply(interaction, "🤖 AI Help: ")
+        with lease:
+            await reply.stream(ai_gateway.complete(query, 500, interaction.user.id, interaction.guild_id))
+        await reply.finish()
+    except AIRejected as e:
+        await interaction.followup.send(f"⏳ {e}", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"❌ AI error: {e}", ephemeral=True)
 
 
 @bot.slash_command(name="ai_fix", description="Ask AI to fix a bot error")
 async def slash_ai_fix(interaction: nextcord.Interaction, error: str):
-    if not openai.api_key:
+    if not openai_configured():
         await interaction.response.send_message("❌ OpenAI API key not set.", ephemeral=True)
         return
-    await interaction.response.defer(ephemeral=True)
+    lease = await admit_interaction(interaction, "ai")
+    if lease is None:
+        return
     try:
         prompt = f"Fix this Discord bot error in Python/nextcord: {error}. Provide code fix and explanation."
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1000
-        )
-        fix = response.choices[0].message.content.strip()
-        await interaction.followup.send(f"🔧 AI Fix: {fix}", ephemeral=True)
+        reply = StreamingReply(interaction, "🔧 AI Fix: ")
+        with lease:
+            await reply.stream(ai_gateway.complete(prompt, 1000, interaction.user.id, interaction.guild_id))
+        await reply.finish()
+    except AIRejected as e:
+        await interaction.followup.send(f"⏳ {e}", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"❌ AI error: {e}", ephemeral=True)
 
 
 @bot.slash_command(name="ai_play", description="Ask AI to suggest a song for a mood")
 async def slash_ai_play(interaction: nextcord.Interaction, mood: str):
-    if not openai.api_key:
+    if not openai_configured():
         await interaction.response.send_message("❌ OpenAI API key not set.", ephemeral=True)
         return
-    await interaction.response.defer(ephemeral=True)
+    lease = await admit_interaction(interaction, "ai")
+    if lease is None:
+        return
     try:
         prompt = f"Suggest one popular song for {mood} mood. Just the song name and artist."
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=100
-        )
-        suggestion = response.choices[0].message.content.strip()
-        await interaction.followup.send(f"🎵 AI Suggestion for {mood}: {suggestion}. Use /play {suggestion} to listen!", ephemeral=True)
+        reply = StreamingReply(interaction, f"🎵 AI Suggestion for {mood}: ")
+        with lease:
+            suggestion = await reply.stream(ai_gateway.complete(prompt, 100, interaction.user.id, interaction.guild_id))
+        await reply.finish(f". Use /play {suggestion} to listen!")
+    except AIRejected as e:
+        await interaction.followup.send(f"⏳ {e}", ephemeral=True)
     except Exception as e:
         await interaction.followup.send(f"❌ AI error: {e}", ephemeral=True)
 
 
+def recommended_shard_count(token: str) -> int:
+    import urllib.request
+    req = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {token}", "User-Agent": "KanziBot (launcher)"},
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return int(json.load(resp)["shards"])
+
+
+def shard_plan(total: int, clusters: int) -> List[List[int]]:
+    """Split shard ids 0..total-1 into contiguous ranges, one per cluster"""
+    return [list(range(i * total // clusters, (i + 1) * total // clusters)) for i in range(clusters)]
+
+
+def launch():
+    """Run shard clusters as child processes and serve their combined metrics"""
+    load_env()
+    token = os.getenv("DISCORD_TOKEN")
+    if not token:
+        print("Please set DISCORD_TOKEN environment variable with your bot token.")
+        return
+    total = int(os.getenv("KANZI_SHARD_COUNT") or 0) or recommended_shard_count(token)
+    clusters = max(1, min(total, int(os.getenv("KANZI_CLUSTERS") or 0) or os.cpu_count() or 1))
+    plan = shard_plan(total, clusters)
+
+    from prometheus_client import CollectorRegistry, multiprocess
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.path.join(DATA_ROOT, "metrics")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=metrics_dir)
+    start_http_server(METRICS_PORT, registry=registry)
+
+    def spawn(cluster: int) -> subprocess.Popen:
+        env = dict(
+            os.environ,
+            KANZI_SHARD_COUNT=str(total),
+            KANZI_SHARD_IDS=",".join(map(str, plan[cluster])),
+            KANZI_CLUSTER_ID=str(cluster),
+            PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+        )
+        print(f"Starting cluster {cluster} with shards {plan[cluster]}")
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+    procs = {cluster: spawn(cluster) for cluster in range(clusters)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in procs.values():
+            proc.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while procs:
+        time.sleep(1)
+        for cluster, proc in list(procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            multiprocess.mark_process_dead(proc.pid, metrics_dir)
+            if stopping:
+                del procs[cluster]
+                continue
+            print(f"Cluster {cluster} exited with code {code}; restarting in 5s")
+            time.sleep(5)
+            procs[cluster] = spawn(cluster)
+
+
 if __name__ == "__main__":
-    run()
+    if sys.argv[1:2] == ["launch"]:
+        launch()
+    else:
+        run()
 
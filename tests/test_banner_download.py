@@ -0,0 +1,60 @@
+# Banner downloads against a local server that streams the body in many chunks.
+#
+#   python -m unittest tests.test_banner_download
+
+import tempfile
+import unittest
+
+from aiohttp import web
+
+from bench.fakes import import_bot
+
+CHUNK = 16 * 1024
+
+
+class BannerDownloadTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.kb = import_bot(tempfile.mkdtemp(prefix="kanzi-test-"), {})
+        app = web.Application()
+        app.router.add_get("/banner/{size}", self.serve)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def serve(self, request: web.Request) -> web.StreamResponse:
+        size = int(request.match_info["size"])
+        # Chunked transfer without Content-Length, so only the streamed size can enforce the cap
+        resp = web.StreamResponse()
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        sent = 0
+        while sent < size:
+            part = min(CHUNK, size - sent)
+            await resp.write(bytes([sent // CHUNK % 256]) * part)
+            sent += part
+        await resp.write_eof()
+        return resp
+
+    async def test_multi_chunk_body_is_read_completely(self):
+        size = 7 * 1024 * 1024 + 12345
+        data = await self.kb.download_banner(f"{self.base_url}/banner/{size}")
+        self.assertEqual(len(data), size)
+        self.assertEqual(data[-1], (size - 1) // CHUNK % 256)
+
+    async def test_body_over_cap_is_rejected(self):
+        size = self.kb.BANNER_MAX_DOWNLOAD + 1
+        with self.assertRaises(self.kb.BannerError):
+            await self.kb.download_banner(f"{self.base_url}/banner/{size}")
+
+    async def test_empty_body_is_rejected(self):
+        with self.assertRaises(self.kb.BannerError):
+            await self.kb.download_banner(f"{self.base_url}/banner/0")
+
+
+if __name__ == "__main__":
+    unittest.main()